@@ -1,42 +1,278 @@
 import asyncio
 import uuid
+from typing import Any, AsyncIterator, Optional
 
-from backend.api.db import get_course_db, get_pathway_db
-from backend.api.llm import get_query_builder, agent
+from backend.api.db import (
+    CandidateStore,
+    CourseVectorDb,
+    PathwayVectorDb,
+    QueryEmbedder,
+    get_course_db,
+    get_pathway_db,
+    get_query_embedder,
+    institution_ipeds,
+)
+from backend.api.llm import QueryBuilderProtocol, get_query_builder
 from backend.api.models import (
     CompleteDegreePathway,
     DegreePathway,
+    DegreePathwayCandidate,
     PathwayCourse,
+    SemesterPlan,
+    UHCourse,
     UHCoursePlan,
     CreditsRange,
+    CourseQuery,
+    CourseQueryBase,
 )
+from backend.api.semantic_cache import SemanticPlanCache
+from backend.api.settings import settings
+from backend.api.summary import SummaryService, get_summary_service
+from backend.api.timing import timed
 
 class DegreePathwayPredictor:
-    def __init__(self):
-        self._course_db = get_course_db()
-        self._pathway_db = get_pathway_db()
-        self._query_builder = get_query_builder()
+    def __init__(
+            self,
+            course_db: CourseVectorDb | None = None,
+            pathway_db: PathwayVectorDb | None = None,
+            query_builder: QueryBuilderProtocol | None = None,
+            embedder: QueryEmbedder | None = None,
+            candidate_store: CandidateStore | None = None,
+            summary_service: SummaryService | None = None,
+            semantic_cache: SemanticPlanCache | None = None,
+    ):
+        self._course_db = course_db or get_course_db()
+        self._pathway_db = pathway_db or get_pathway_db()
+        self._query_builder = query_builder or get_query_builder()
+        self._embedder = embedder or get_query_embedder()
+        self._candidate_store = candidate_store
+        self._summaries = summary_service or get_summary_service()
+        self._semantic_cache = semantic_cache
+
+    async def _embed(self, query: str) -> list[float]:
+        with timed("embed"):
+            return await self._embedder.embed(query)
+
+    async def predict(
+            self,
+            query: str,
+            summary_deadline: Optional[float] = None,
+            cross_campus: bool = False,
+    ) -> CompleteDegreePathway:
+        vector = await self._embed(query)
+        scope = self._semantic_scope(None, cross_campus)
+        plan = self._semantic_lookup(vector, scope)
+        if plan is not None:
+            return plan
+        pathways = await self._find_pathways(query, vector)
+        plan = await self._complete_pathway(query, pathways, vector, summary_deadline, cross_campus)
+        self._semantic_store(vector, scope, plan)
+        return plan
+
+    async def predict_by_pathway_id(
+            self,
+            pathway_id: str,
+            query: str,
+            summary_deadline: Optional[float] = None,
+            cross_campus: bool = False,
+    ) -> CompleteDegreePathway:
+        vector = await self._embed(query)
+        scope = self._semantic_scope(pathway_id, cross_campus)
+        plan = self._semantic_lookup(vector, scope)
+        if plan is not None:
+            return plan
+        pathways = await self._find_pathways(query, vector, pathway_id=pathway_id)
+        plan = await self._complete_pathway(query, pathways, vector, summary_deadline, cross_campus)
+        self._semantic_store(vector, scope, plan)
+        return plan
+
+    async def complete_pathways(
+            self,
+            pathway_ids: list[str],
+            query: str,
+            cross_campus: bool = False,
+    ) -> AsyncIterator[CompleteDegreePathway]:
+        """
+        Plans for several pathways against one query, for bulk export. The query
+        is embedded and similar pathways searched once, and every id is looked
+        up before this returns, so an unknown one raises ValueError here. The
+        plans are then built pdf_export_batch_plan_concurrency at a time and
+        yielded in order as they finish. No summary is generated (one already
+        cached for the plan is still used).
+        """
+        vector = await self._embed(query)
+        similar = await self._find_pathways(query, vector)
+        selections = await asyncio.gather(*(self._with_pathway(pathway_id, similar) for pathway_id in pathway_ids))
+        return self._complete_each(query, list(selections), vector, cross_campus)
+
+    async def _complete_each(
+            self,
+            query: str,
+            selections: list[list[DegreePathway]],
+            vector: list[float],
+            cross_campus: bool,
+    ) -> AsyncIterator[CompleteDegreePathway]:
+        semaphore = asyncio.Semaphore(settings.pdf_export_batch_plan_concurrency)
+
+        async def complete(pathways: list[DegreePathway]) -> CompleteDegreePathway:
+            async with semaphore:
+                plan = await self._build_plan(query, pathways, vector, cross_campus)
+                plan.summary = await self._summaries.summarize_within(plan, query, 0) or ""
+                return plan
+
+        tasks = [asyncio.ensure_future(complete(pathways)) for pathways in selections]
+        try:
+            for task in tasks:
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    @staticmethod
+    def _semantic_scope(pathway_id: Optional[str], cross_campus: bool) -> str:
+        """Plans are only reused between requests for the same pathway and campus mode."""
+        return f"{pathway_id or ''}|{'cross' if cross_campus else ''}"
+
+    def _semantic_lookup(self, vector: list[float], scope: str) -> Optional[CompleteDegreePathway]:
+        if self._semantic_cache is None:
+            return None
+        with timed("semantic_cache"):
+            return self._semantic_cache.lookup(vector, scope)
+
+    def _semantic_store(self, vector: list[float], scope: str, plan: CompleteDegreePathway) -> None:
+        # Plans without a summary are left out, like in the response cache.
+        if self._semantic_cache is not None and plan.summary:
+            self._semantic_cache.store(vector, plan, scope)
+
+    async def summarize(self, plan: CompleteDegreePathway, query: str) -> str:
+        return await self._summaries.summarize(plan, query)
 
-    async def predict(self, query: str) -> CompleteDegreePathway:
-        pathways = self._pathway_db.get_similar_pathways(query=query)
-        return await self._complete_pathway(query, pathways)
+    async def stream(
+            self,
+            query: str,
+            pathway_id: Optional[str] = None,
+            cross_campus: bool = False,
+    ) -> AsyncIterator[dict[str, Any]]:
+        """
+        Same pipeline as predict, yielded as events while it runs: the selected
+        pathway skeleton and candidates, every completed semester, the summary as
+        it streams from the LLM, and finally the whole plan.
+        """
+        vector = await self._embed(query)
+        pathways = await self._find_pathways(query, vector, pathway_id=pathway_id)
+        yield {
+            "event": "pathway",
+            "pathway": pathways[0].model_dump(mode="json"),
+            "candidates": self._candidates(pathways),
+        }
 
-    async def predict_by_pathway_id(self, pathway_id: str, query: str) -> CompleteDegreePathway:
-        pathway = self._pathway_db.get_pathway(pathway_id)
+        # Courses arrive in requirement order as their searches finish, so each
+        # semester goes out once its own courses (and every earlier one) are done.
+        courses = self._plan_courses(query, pathways, vector, cross_campus)
+        plan_courses: list[UHCoursePlan] = []
+        for year in pathways[0].years:
+            for index, semester in enumerate(year.semesters):
+                semester_courses = [await anext(courses) for _ in semester.courses]
+                plan_courses.extend(semester_courses)
+                semester_plan = SemesterPlan[UHCoursePlan].model_construct(
+                    semester_name=semester.semester_name,
+                    credits=semester.credits,
+                    courses=semester_courses,
+                )
+                yield {
+                    "event": "semester",
+                    "year_number": year.year_number,
+                    "semester_index": index,
+                    "semester": semester_plan.model_dump(mode="json", by_alias=True),
+                }
+        candidates = [DegreePathwayCandidate.model_construct(**c) for c in self._candidates(pathways)]
+        plan = CompleteDegreePathway.assemble(pathways[0], plan_courses, candidates)
+
+        parts: list[str] = []
+        async for delta in self._summaries.stream(plan, query):
+            parts.append(delta)
+            yield {"event": "summary", "delta": delta}
+        plan.summary = "".join(parts)
+
+        yield {"event": "done", "plan": plan.model_dump(mode="json", by_alias=True)}
+
+    async def _find_pathways(
+            self,
+            query: str,
+            vector: list[float],
+            pathway_id: Optional[str] = None,
+    ) -> list[DegreePathway]:
+        """Pathways to offer, the one that gets completed first."""
+        similar = await self._pathway_db.get_similar_pathways(
+            query=query,
+            vector=vector,
+            mode=settings.pathway_search_mode,
+        )
+        if pathway_id is None:
+            return similar
+        return await self._with_pathway(pathway_id, similar)
+
+    async def _with_pathway(self, pathway_id: str, similar: list[DegreePathway]) -> list[DegreePathway]:
+        pathway = await self._pathway_db.get_pathway(pathway_id)
         if pathway is None:
             raise ValueError(f"Pathway '{pathway_id}' not found")
 
-        similar = self._pathway_db.get_similar_pathways(query=query)
         combined_pathways: list[DegreePathway] = [pathway]
         combined_pathways.extend(p for p in similar if p.pathway_id != pathway.pathway_id)
+        return combined_pathways
 
-        return await self._complete_pathway(query, combined_pathways)
+    @staticmethod
+    def _candidates(pathways: list[DegreePathway]) -> list[dict]:
+        return [
+            {
+                "name": c.program_name,
+                "pathway_id": c.pathway_id,
+            }
+            for c in pathways
+        ]
 
-    async def _complete_pathway(self, query: str, pathways: list[DegreePathway]) -> CompleteDegreePathway:
-        pathway = pathways[0]
-        base = pathway.model_dump()
+    async def _complete_pathway(
+            self,
+            query: str,
+            pathways: list[DegreePathway],
+            vector: list[float],
+            summary_deadline: Optional[float] = None,
+            cross_campus: bool = False,
+    ) -> CompleteDegreePathway:
+        with timed("courses"):
+            plan = await self._build_plan(query, pathways, vector, cross_campus)
+        if summary_deadline is None:
+            summary_deadline = settings.summary_deadline_seconds
+        # Without a summary in time the plan goes out as is; POST /summary fills it in later.
+        with timed("summary"):
+            plan.summary = await self._summaries.summarize_within(plan, query, summary_deadline) or ""
+        return plan
+
+    async def _build_plan(
+            self,
+            query: str,
+            pathways: list[DegreePathway],
+            vector: list[float],
+            cross_campus: bool = False,
+    ) -> CompleteDegreePathway:
+        """The completed plan, without a summary."""
+        courses = [course async for course in self._plan_courses(query, pathways, vector, cross_campus)]
+        candidates = [DegreePathwayCandidate.model_construct(**c) for c in self._candidates(pathways)]
+        return CompleteDegreePathway.assemble(pathways[0], courses, candidates)
 
-        completed_years: list[dict] = []
+    async def _plan_courses(
+            self,
+            query: str,
+            pathways: list[DegreePathway],
+            vector: list[float],
+            cross_campus: bool = False,
+    ) -> AsyncIterator[UHCoursePlan]:
+        """
+        The completed course for each requirement of pathways[0] in
+        flatten_pathway_courses order, each yielded once its search has finished.
+        Courses come from the pathway's own campus unless cross_campus is set.
+        """
+        pathway = pathways[0]
 
         course_names: list[str] = []
         flattened_courses: list[PathwayCourse] = []
@@ -46,75 +282,113 @@ class DegreePathwayPredictor:
                     course_names.append(c.name)
                     flattened_courses.append(c)
 
-        course_queries = await self._query_builder.build_queries(course_names)
-
-        if len(course_names) != len(course_queries):
-            print(f"WARNING: queries do not match courses length, courses {len(course_names)}, queries {len(course_queries)}")
-
-
-        query_coros = [
-            self._course_db.query(text=query, query=course_query, pathway_course=pathway_course)
-            for course_query, pathway_course in zip(course_queries, flattened_courses)
-        ]
-        course_query_results = await asyncio.gather(*query_coros) if query_coros else []
-
-        all_courses_no_candidates = []
-        i = 0
-        for year in pathway.years:
-            completed_semesters: list[dict] = []
+        inst_ipeds = None
+        if not cross_campus:
+            inst_ipeds = institution_ipeds(pathway.institution)
+            if inst_ipeds is None:
+                print(f"WARNING: no IPEDS id configured for '{pathway.institution}', searching every campus")
 
-            for sem in year.semesters:
-                completed_courses: list[dict] = []
-
-                for c in sem.courses:
-                    courses = course_query_results[i] if i < len(course_query_results) else []
-                    i += 1
-
-                    if courses:
-                        course = UHCoursePlan(**courses[0].model_dump(), candidates=courses)
-                        all_courses_no_candidates.append((courses[0].model_dump_json(indent=2)))
+        # Candidate sets were resolved for the pathway's campus only. A stored set is
+        # used only at a position resolved for the same requirement, so renamed or
+        # reordered requirements fall back to the filtered search.
+        candidate_sets: list[Optional[list[str]]] = [None] * len(flattened_courses)
+        if self._candidate_store and not cross_campus:
+            stored = await self._candidate_store.get(pathway.pathway_id)
+            if stored is not None:
+                stale = len(stored) != len(flattened_courses)
+                for i, (candidates, pathway_course) in enumerate(zip(stored, flattened_courses)):
+                    if (candidates.name, candidates.credits) == (pathway_course.name, pathway_course.credits):
+                        candidate_sets[i] = candidates.course_ids
                     else:
-                        course = self._build_placeholder_course(c)
+                        stale = True
+                if stale:
+                    print(f"WARNING: stale candidate sets for pathway {pathway.pathway_id}, rerun precompute-candidates")
 
-                    completed_courses.append(course.model_dump())
+        # Requirements resolved offline need no structured query.
+        unresolved = [i for i, ids in enumerate(candidate_sets) if ids is None]
+        course_queries = [CourseQueryBase() for _ in course_names]
+        if unresolved:
+            built = await self._query_builder.build_queries([course_names[i] for i in unresolved])
+            if len(built) != len(unresolved):
+                print(f"WARNING: queries do not match courses length, courses {len(unresolved)}, queries {len(built)}")
+            for i, course_query in zip(unresolved, built):
+                course_queries[i] = course_query
 
-                completed_semesters.append(
-                    {
-                        "semester_name": sem.semester_name,
-                        "credits": sem.credits,
-                        "courses": completed_courses,
-                    }
+        requirement_queries: list[CourseQuery] = []
+        for i, (course_query, pathway_course) in enumerate(zip(course_queries, flattened_courses)):
+            if candidate_sets[i] is not None:
+                # Structured filters were already applied offline, only rank by similarity.
+                requirement_queries.append(
+                    CourseQuery(query=query, vector=vector, course_ids=candidate_sets[i], inst_ipeds=inst_ipeds, k=10, n=1)
+                )
+            else:
+                requirement_queries.append(
+                    self._course_db.build_query(
+                        text=query,
+                        query_base=course_query,
+                        pathway_course=pathway_course,
+                        vector=vector,
+                        inst_ipeds=inst_ipeds,
+                    )
                 )
+        searched = 0
+        async for courses in self._search_requirements(flattened_courses, requirement_queries):
+            if courses:
+                yield UHCoursePlan.from_candidates(courses)
+            else:
+                yield self._build_placeholder_course(pathway.pathway_id, searched, flattened_courses[searched])
+            searched += 1
+        for position in range(searched, len(flattened_courses)):
+            yield self._build_placeholder_course(pathway.pathway_id, position, flattened_courses[position])
 
-            completed_years.append(
-                {
-                    "year_number": year.year_number,
-                    "semesters": completed_semesters,
-                }
-            )
+    async def _search_requirements(
+            self,
+            flattened_courses: list[PathwayCourse],
+            requirement_queries: list[CourseQuery],
+    ) -> AsyncIterator[list[UHCourse]]:
+        """
+        Run one search per distinct requirement (pathways repeat slots like "Elective"),
+        asking for enough results to cover every slot, then hand out distinct courses so
+        the plan never recommends the same course twice while alternatives remain.
+        All searches start at once; results are yielded per slot, in order, as soon
+        as the slot's search is done.
+        """
+        groups: dict[tuple[str, int], list[int]] = {}
+        for i, pathway_course in enumerate(flattened_courses[:len(requirement_queries)]):
+            groups.setdefault((pathway_course.name, pathway_course.credits), []).append(i)
 
-        # Replace years with the completed structure
-        base["years"] = completed_years
-        base["candidates"] = [
-            {
-                "name": c.program_name,
-                "pathway_id": c.pathway_id,
-            }
-            for c in pathways
-        ]
-        summary = await agent.run(f"COURSES: {'\n'.join(all_courses_no_candidates)}\n\n\n\n explain in 8 sentences how these courses resonate well with this query. QUERY: '{query}' Your tone should be like you are speaking to the person who wrote the query (you speak as if you are the college counselor). do not use em dashes. Do not start with a greeting. Just go to the summary straight away.")
-        base["summary"] = str(summary.output)
-        # base["summary"] = "hello"
+        group_queries = []
+        for slots in groups.values():
+            first = requirement_queries[slots[0]]
+            group_queries.append(first.model_copy(update={"k": (first.k or 10) + len(slots) - 1}))
+        searches = dict(zip(groups, self._course_db.search_similar_courses(group_queries)))
 
+        taken: set[str] = set()
+        try:
+            for i, requirement_query in enumerate(requirement_queries):
+                pathway_course = flattened_courses[i]
+                results = await searches[(pathway_course.name, pathway_course.credits)]
+                if not results:
+                    yield []
+                    continue
 
-        # Re-validate as CompleteDegreePathway (this will build all nested models)
-        return CompleteDegreePathway.model_validate(base)
+                chosen = next((r for r in results if r.course_id not in taken), results[0])
+                taken.add(chosen.course_id)
+                alternatives = [r for r in results if r.course_id not in taken]
+                yield [chosen, *alternatives][:requirement_query.k or 10]
+        finally:
+            for search in searches.values():
+                search.cancel()
 
-    def _build_placeholder_course(self, pathway_course: PathwayCourse) -> UHCoursePlan:
-        """Fallback when no matching UH course is found."""
+    @staticmethod
+    def _build_placeholder_course(pathway_id: str, position: int, pathway_course: PathwayCourse) -> UHCoursePlan:
+        """
+        Fallback when no matching UH course is found. The id is derived from the
+        slot, so the same plan always hashes the same (summary and response caches).
+        """
         credits = pathway_course.credits
         return UHCoursePlan(
-            course_id=str(uuid.uuid4()),
+            course_id=str(uuid.uuid5(uuid.NAMESPACE_URL, f"placeholder/{pathway_id}/{position}/{pathway_course.name}")),
             subject_code="TBD",
             course_number=0,
             course_suffix=None,
@@ -0,0 +1,48 @@
+import numpy as np
+
+from backend.api.db import CourseVectorDb, PathwayVectorDb, RequirementCandidatesLance, institution_ipeds
+from backend.api.llm import QueryBuilderProtocol
+from backend.api.models import flatten_pathway_courses
+
+
+async def precompute_candidates(
+        course_db: CourseVectorDb,
+        pathway_db: PathwayVectorDb,
+        query_builder: QueryBuilderProtocol,
+        max_candidates: int,
+) -> list[RequirementCandidatesLance]:
+    """
+    Resolve the structured part of every pathway requirement (subject, number range,
+    suffix, designations, credits) to the ids of the courses it allows. Only the
+    user's text changes between requests, so at request time the predictor just
+    ranks these ids by similarity instead of running a filtered search.
+    """
+    index = await course_db.get_index()
+    pathways = await pathway_db.list_pathways()
+
+    resolved: dict[tuple[str, int, int | None], list[str] | None] = {}
+    rows: list[RequirementCandidatesLance] = []
+    for pathway in pathways:
+        courses = flatten_pathway_courses(pathway)
+        queries = await query_builder.build_queries([c.name for c in courses])
+        # Candidates come from the pathway's own campus, like the live search.
+        inst_ipeds = institution_ipeds(pathway.institution)
+        for position, (course, query_base) in enumerate(zip(courses, queries)):
+            key = (course.name, course.credits, inst_ipeds)
+            if key not in resolved:
+                mask = index.mask(CourseVectorDb.build_query("", query_base, course, inst_ipeds=inst_ipeds))
+                ids = [index.courses[i].course_id for i in np.flatnonzero(mask)]
+                resolved[key] = ids if len(ids) <= max_candidates else None
+            rows.append(
+                RequirementCandidatesLance(
+                    pathway_id=pathway.pathway_id,
+                    position=position,
+                    name=course.name,
+                    credits=course.credits,
+                    course_ids=resolved[key],
+                )
+            )
+
+    stored = sum(1 for r in rows if r.course_ids is not None)
+    print(f"Resolved {len(rows)} requirements across {len(pathways)} pathways ({stored} with candidate sets)")
+    return rows
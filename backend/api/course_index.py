@@ -0,0 +1,164 @@
+import asyncio
+
+import numpy as np
+import pyarrow as pa
+from lancedb.table import AsyncTable
+from pydantic import TypeAdapter
+
+from backend.api.models import CourseQuery, UHCourse
+
+_COURSE_FIELDS = list(UHCourse.model_fields)
+_COURSE_LIST = TypeAdapter(list[UHCourse])
+
+
+def courses_from_arrow(data: pa.Table) -> list[UHCourse]:
+    """
+    UHCourse objects straight from stored rows, without a JSON round-trip. One
+    TypeAdapter call validates the whole batch inside pydantic-core, which is
+    faster than model_construct's per-field Python loop.
+    """
+    return _COURSE_LIST.validate_python(data.select(_COURSE_FIELDS).to_pylist())
+
+
+class InMemoryCourseIndex:
+    """
+    The whole course catalog held in RAM: one contiguous float32 matrix of vectors
+    plus NumPy columns for every CourseQuery filter. Answers the same questions as
+    the Lance path of CourseVectorDb.get_similar_courses (flat L2 search, same
+    filters, same ordering) without a round-trip per requirement.
+    """
+
+    def __init__(self, courses: list[UHCourse], vectors: np.ndarray, version: int | None = None):
+        self.courses = courses
+        self.version = version
+        self._positions = {c.course_id: i for i, c in enumerate(courses)}
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self._sq_norms = np.einsum("ij,ij->i", self.vectors, self.vectors)
+        self._has_vector = np.isfinite(self._sq_norms)
+
+        self.subject_code = np.array([c.subject_code for c in courses], dtype=object)
+        self.course_number = np.array([c.course_number for c in courses], dtype=np.int64)
+        self.course_suffix = np.array([c.course_suffix for c in courses], dtype=object)
+        self.units_min = np.array([c.num_units.min for c in courses], dtype=np.float64)
+        self.units_max = np.array([c.num_units.max for c in courses], dtype=np.float64)
+        self.inst_ipeds = np.array([c.inst_ipeds for c in courses], dtype=np.int64)
+
+        vocabulary = sorted({d for c in courses for d in c.designations})
+        if len(vocabulary) > 64:
+            raise ValueError(f"Too many distinct designations for a 64-bit mask: {len(vocabulary)}")
+        self._designation_bits = {d: np.uint64(1 << i) for i, d in enumerate(vocabulary)}
+        self.designations = np.zeros(len(courses), dtype=np.uint64)
+        for i, c in enumerate(courses):
+            for d in c.designations:
+                self.designations[i] |= self._designation_bits[d]
+
+    @classmethod
+    def from_arrow(cls, data: pa.Table, version: int | None = None) -> "InMemoryCourseIndex":
+        courses = courses_from_arrow(data)
+
+        vector_column = data["vector"].combine_chunks()
+        dims = vector_column.type.list_size
+        vectors = np.full((len(courses), dims), np.nan, dtype=np.float32)
+        valid = np.asarray(vector_column.is_valid())
+        if valid.any():
+            values = vector_column.filter(vector_column.is_valid()).flatten()
+            vectors[valid] = np.asarray(values, dtype=np.float32).reshape(-1, dims)
+        return cls(courses, vectors, version)
+
+    @classmethod
+    async def load(cls, table: AsyncTable) -> "InMemoryCourseIndex":
+        version = await table.version()
+        data = await table.query().to_arrow()
+        # Validating the whole catalog and building the masks takes most of a second.
+        return await asyncio.to_thread(cls.from_arrow, data, version)
+
+    def __len__(self) -> int:
+        return len(self.courses)
+
+    def mask(self, query: CourseQuery) -> np.ndarray:
+        """Boolean mask equivalent to the SQL where-clause built for Lance."""
+        mask = self.mask_subset(query, slice(None))
+        if query.course_ids is not None:
+            in_set = np.zeros(len(self.courses), dtype=bool)
+            in_set[self.positions(query.course_ids)] = True
+            mask &= in_set
+        return mask
+
+    def mask_subset(self, query: CourseQuery, idx) -> np.ndarray:
+        """The structured filters of a query evaluated over the rows in idx."""
+        mask = np.ones(len(self.course_number[idx]), dtype=bool)
+        if query.inst_ipeds is not None:
+            mask &= self.inst_ipeds[idx] == query.inst_ipeds
+        if query.credits:
+            mask &= (self.units_min[idx] <= query.credits) & (self.units_max[idx] >= query.credits)
+        if query.subject_code:
+            mask &= self.subject_code[idx] == query.subject_code
+        if query.course_number:
+            mask &= self.course_number[idx] == query.course_number
+        if query.course_number_gte:
+            mask &= self.course_number[idx] >= query.course_number_gte
+        if query.course_suffix:
+            mask &= self.course_suffix[idx] == query.course_suffix
+        if query.designations:
+            bits = np.uint64(0)
+            for d in query.designations:
+                bits |= self._designation_bits.get(d, np.uint64(0))
+            mask &= (self.designations[idx] & bits) != 0
+        return mask
+
+    def positions(self, course_ids: list[str]) -> np.ndarray:
+        """Row positions of the given courses, ignoring ids no longer in the catalog."""
+        return np.array(sorted({self._positions[i] for i in course_ids if i in self._positions}), dtype=np.int64)
+
+    def _distances(self, vector: list[float]) -> np.ndarray:
+        q = np.asarray(vector, dtype=np.float32)
+        return self._sq_norms - 2.0 * (self.vectors @ q) + float(q @ q)
+
+    def _rank_subset(self, query: CourseQuery, k: int) -> list[UHCourse]:
+        """Rank a precomputed candidate set without touching the rest of the catalog."""
+        idx = self.positions(query.course_ids)
+        idx = idx[self.mask_subset(query, idx)]
+        if query.vector is None:
+            return [self.courses[i] for i in idx[:k]]
+        idx = idx[self._has_vector[idx]]
+        q = np.asarray(query.vector, dtype=np.float32)
+        d = self._sq_norms[idx] - 2.0 * (self.vectors[idx] @ q) + float(q @ q)
+        order = np.lexsort((idx, d))[:k]
+        return [self.courses[i] for i in idx[order]]
+
+    def _top_k(self, mask: np.ndarray, distances: np.ndarray | None, k: int) -> list[UHCourse]:
+        if distances is None:
+            # Plain filtered scan: storage order, like table.search().where().limit()
+            idx = np.flatnonzero(mask)[:k]
+        else:
+            idx = np.flatnonzero(mask & self._has_vector)
+            d = distances[idx]
+            if len(idx) > k:
+                keep = np.argpartition(d, k - 1)[:k]
+                idx, d = idx[keep], d[keep]
+            idx = idx[np.lexsort((idx, d))]
+        return [self.courses[i] for i in idx]
+
+    def search_many(self, queries: list[CourseQuery]) -> list[list[UHCourse]]:
+        """
+        Answer every query with a single matrix-vector product per distinct query
+        vector. All requirements of a pathway share the user's vector, so a whole
+        pathway normally costs one product plus a masked top-k per requirement.
+        """
+        distances_by_vector: dict[tuple[float, ...], np.ndarray] = {}
+        results: list[list[UHCourse]] = []
+        for query in queries:
+            if query.course_ids is not None:
+                results.append(self._rank_subset(query, query.k or 10))
+                continue
+            distances = None
+            if query.vector is not None:
+                key = tuple(query.vector)
+                distances = distances_by_vector.get(key)
+                if distances is None:
+                    distances = distances_by_vector[key] = self._distances(query.vector)
+            results.append(self._top_k(self.mask(query), distances, query.k or 10))
+        return results
+
+    def search(self, query: CourseQuery) -> list[UHCourse]:
+        return self.search_many([query])[0]
@@ -1,113 +1,425 @@
 import asyncio
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
 import lancedb
+import numpy as np
 from lancedb.embeddings import get_registry, EmbeddingFunction
 from lancedb import DBConnection, AsyncConnection
+from lancedb.query import AsyncVectorQuery
 from lancedb.table import AsyncTable
-from typing import Optional
-
+from typing import Literal, NamedTuple, Optional
+
+from backend.api.course_index import InMemoryCourseIndex, courses_from_arrow
+from backend.api.embeddings import get_embedding_cache
+from backend.api.ingest import (
+    EmbeddingPipeline,
+    IngestReport,
+    content_hash,
+    ensure_content_hash_column,
+    get_embedding_pipeline,
+    sync_table,
+)
+from backend.api.keyword_index import PathwayKeywordIndex, reciprocal_rank_fusion, tokenize
 from backend.api.models import UHCourse, PathwayCourse, CourseQuery, CourseQueryBase
 from backend.api.settings import settings
+from backend.api.timing import timed
 
-from backend.api.models import DegreePathway
+from backend.api.models import DegreePathway, DegreePathwaySummary
 
 _db = lancedb.connect(settings.lancedb_storage_path)
-_func = get_registry().get("openai").create()
+# Same OpenAI model, but texts we have embedded before are served from the local cache.
+_func = get_registry().get("openai-cached").create(base_url=settings.openai_base_url)
+
+async def _connect_async(uri: str) -> AsyncConnection:
+    # With a consistency interval, table.version() notices writes made by other
+    # processes (ingestion), which is what invalidates the in-memory indexes and caches.
+    interval = settings.lance_read_consistency_seconds
+    return await lancedb.connect_async(
+        uri,
+        read_consistency_interval=timedelta(seconds=interval) if interval is not None else None,
+    )
+
+def _id_list(course_ids: list[str]) -> str:
+    return ", ".join(f"'{PathwayVectorDb._escape_like(i)}'" for i in course_ids)
+
+def _institution_key(name: str) -> str:
+    return " ".join(tokenize(name))
+
+_INSTITUTION_IPEDS = {_institution_key(name): ipeds for name, ipeds in settings.institution_ipeds.items()}
+
+def institution_ipeds(institution: str) -> Optional[int]:
+    """IPEDS id of a pathway's institution, or None when it is not configured."""
+    return _INSTITUTION_IPEDS.get(_institution_key(institution))
+
+def _tune_vector_query(q: AsyncVectorQuery) -> AsyncVectorQuery:
+    """ANN search parameters, only used once `manage optimize` has built a vector index."""
+    q = q.nprobes(settings.vector_search_nprobes)
+    if settings.vector_search_refine_factor:
+        q = q.refine_factor(settings.vector_search_refine_factor)
+    return q
 
 
 from lancedb.pydantic import LanceModel, Vector
 
 class DegreePathwayLance(LanceModel):
     pathway_id: str
+    # Listing metadata as real columns so searches can skip parsing `text`.
+    program_name: str
+    institution: str
+    total_credits: int
+    course_count: int
     text: str = _func.SourceField()
+    # sha256 of text, lets ingestion skip re-embedding unchanged records.
+    content_hash: Optional[str] = None
     vector: Vector(_func.ndims()) = _func.VectorField()
 
+def pathway_to_lance(pathway: DegreePathway) -> dict:
+    text = pathway.model_dump_json(indent=2)
+    return {
+        **DegreePathwaySummary.from_pathway(pathway).model_dump(),
+        "text": text,
+        "content_hash": content_hash(text),
+    }
+
+TextSearchMode = Literal["bm25", "like"]
+PathwaySearchMode = Literal["vector", "hybrid"]
+PathwayView = Literal["full", "summary"]
+PathwayResults = list[DegreePathway] | list[DegreePathwaySummary]
+
+_SUMMARY_COLUMNS = list(DegreePathwaySummary.model_fields)
+
 class PathwayVectorDb:
     def __init__(self, db: DBConnection, func: EmbeddingFunction):
         self.db = db
         self.func = func
+        self._async_db: Optional[AsyncConnection] = None
+        self._async_table: Optional[AsyncTable] = None
+        self._async_table_lock: Optional[asyncio.Lock] = None
+        self._has_summary_columns = False
+        self._keyword_index: Optional[PathwayKeywordIndex] = None
+        self._keyword_index_lock: Optional[asyncio.Lock] = None
+        self._pathway_cache: OrderedDict[str, DegreePathway] = OrderedDict()
+        self._pathway_cache_version: Optional[int] = None
+        self._db_uri = db.uri
 
-    def get_similar_pathways(self, query: str, limit: int = 8) -> list[DegreePathway]:
-        table = self.db.open_table("pathways")
-        results = table.search(query).limit(limit).to_pydantic(DegreePathwayLance)
-        return [DegreePathway.model_validate_json(r.text) for r in results]
+    async def warm_up(self) -> None:
+        await self._get_async_table()
+        await self.get_keyword_index()
+
+    async def _get_async_table(self) -> AsyncTable:
+        if self._async_table is not None:
+            return self._async_table
+
+        if self._async_table_lock is None:
+            self._async_table_lock = asyncio.Lock()
+
+        async with self._async_table_lock:
+            if self._async_table is None:
+                if self._async_db is None:
+                    self._async_db = await _connect_async(self._db_uri)
+                table = await self._async_db.open_table("pathways")
+                self._has_summary_columns = "program_name" in (await table.schema()).names
+                if not self._has_summary_columns:
+                    print("pathways table has no metadata columns, run `python -m backend.manage migrate-pathways`")
+                self._async_table = table
+        return self._async_table
+
+    def _columns(self, view: PathwayView) -> list[str]:
+        if view == "summary" and self._has_summary_columns:
+            return _SUMMARY_COLUMNS
+        return ["text"]
+
+    @staticmethod
+    def _from_rows(rows: list[dict], view: PathwayView) -> PathwayResults:
+        if view == "full":
+            return [DegreePathway.model_validate_json(r["text"]) for r in rows]
+        if rows and "text" in rows[0]:
+            # Tables written before the metadata columns existed.
+            return [DegreePathwaySummary.from_pathway(DegreePathway.model_validate_json(r["text"])) for r in rows]
+        return [DegreePathwaySummary.model_validate({k: r[k] for k in _SUMMARY_COLUMNS}) for r in rows]
+
+    @staticmethod
+    def _project(pathways: list[DegreePathway], view: PathwayView) -> PathwayResults:
+        if view == "full":
+            return pathways
+        return [DegreePathwaySummary.from_pathway(p) for p in pathways]
+
+    async def get_similar_pathways(
+            self,
+            query: str,
+            limit: int = 8,
+            vector: Optional[list[float]] = None,
+            mode: PathwaySearchMode = "vector",
+            view: PathwayView = "full",
+    ) -> PathwayResults:
+        """
+        "vector" ranks by embedding similarity only. "hybrid" also runs the BM25 keyword
+        search and fuses both rankings, so exact program names ("BS Computer Science")
+        land first even when the embedding prefers a vaguer match. The "summary" view
+        returns only listing columns and never parses the pathway documents.
+        """
+        if mode == "hybrid":
+            return await self._hybrid_search(query, limit, vector, view)
+        return await self._vector_search(query, limit, vector, view)
+
+    async def _vector_search(
+            self,
+            query: str,
+            limit: int,
+            vector: Optional[list[float]],
+            view: PathwayView,
+    ) -> PathwayResults:
+        table = await self._get_async_table()
+        if vector is None:
+            with timed("embed"):
+                # The embedding client is synchronous, keep it off the event loop.
+                vector = (await asyncio.to_thread(self.func.compute_query_embeddings_with_retry, query))[0]
+        with timed("vector_search"):
+            q = _tune_vector_query(await table.search(vector, query_type="vector"))
+            rows = await q.select([*self._columns(view), "_distance"]).limit(limit).to_list()
+            return self._from_rows(rows, view)
+
+    async def _keyword_search(self, query: str, limit: int, view: PathwayView) -> PathwayResults:
+        index = await self.get_keyword_index()
+        with timed("keyword_search"):
+            hits = await asyncio.to_thread(index.search, query, limit)
+            return self._project([pathway for pathway, _ in hits], view)
+
+    async def _hybrid_search(
+            self,
+            query: str,
+            limit: int,
+            vector: Optional[list[float]],
+            view: PathwayView,
+    ) -> PathwayResults:
+        depth = max(limit, settings.hybrid_search_depth)
+        vector_hits, keyword_hits = await asyncio.gather(
+            self._vector_search(query, depth, vector, view),
+            self._keyword_search(query, depth, view),
+        )
+        with timed("fusion"):
+            return reciprocal_rank_fusion([vector_hits, keyword_hits], k=settings.rrf_k)[:limit]
 
     @staticmethod
     def _escape_like(value: str) -> str:
         """Escape single quotes for use inside a LIKE clause."""
         return value.replace("'", "''")
 
-    def text_search(self, query: str, limit: int = 8) -> list[DegreePathway]:
-        """Run a simple SQL LIKE query against the serialized pathway text."""
-        table = self.db.open_table("pathways")
+    async def get_keyword_index(self) -> PathwayKeywordIndex:
+        table = await self._get_async_table()
+        if self._keyword_index is not None and self._keyword_index.version == await table.version():
+            return self._keyword_index
+
+        if self._keyword_index_lock is None:
+            self._keyword_index_lock = asyncio.Lock()
+
+        async with self._keyword_index_lock:
+            version = await table.version()
+            if self._keyword_index is None or self._keyword_index.version != version:
+                pathways = await self.list_pathways()
+                self._keyword_index = await asyncio.to_thread(PathwayKeywordIndex, pathways, version)
+                print(f"Indexed {len(pathways)} pathways for keyword search (version {version})")
+        return self._keyword_index
+
+    async def text_search(
+            self,
+            query: str,
+            limit: int = 8,
+            mode: TextSearchMode = "bm25",
+            view: PathwayView = "full",
+    ) -> PathwayResults:
+        """
+        Keyword search over pathways. "bm25" ranks program and course names by relevance
+        with prefix matching; "like" is the old substring scan over the serialized JSON.
+        """
+        if mode == "bm25":
+            return await self._keyword_search(query, limit, view)
+
+        table = await self._get_async_table()
         escaped = self._escape_like(query.lower())
         where_clause = f"lower(text) LIKE '%{escaped}%'"
-        results = (
-            table.search()
-            .where(where_clause)
-            .limit(limit)
-            .to_pydantic(DegreePathwayLance)
-        )
-        return [DegreePathway.model_validate_json(r.text) for r in results]
+        rows = await table.query().where(where_clause).select(self._columns(view)).limit(limit).to_list()
+        return self._from_rows(rows, view)
 
-    def get_pathway(self, pathway_id: str) -> Optional[DegreePathway]:
-        table = self.db.open_table("pathways")
-        results = (
-            table.search()
-            .where(f"pathway_id = '{pathway_id}'")
-            .limit(1)
-            .to_pydantic(DegreePathwayLance)
-        )
-        if not results:
+    async def list_pathways(self) -> list[DegreePathway]:
+        table = await self._get_async_table()
+        rows = await table.query().select(["text"]).to_list()
+        return [DegreePathway.model_validate_json(r["text"]) for r in rows]
+
+    async def get_pathway(self, pathway_id: str) -> Optional[DegreePathway]:
+        """
+        Parsed pathways are kept in a bounded LRU that is dropped whenever the table
+        version changes; misses use the BTREE index on pathway_id.
+        """
+        table = await self._get_async_table()
+        version = await table.version()
+        if version != self._pathway_cache_version:
+            self._pathway_cache.clear()
+            self._pathway_cache_version = version
+
+        pathway = self._pathway_cache.get(pathway_id)
+        if pathway is not None:
+            self._pathway_cache.move_to_end(pathway_id)
+            return pathway
+
+        escaped = self._escape_like(pathway_id)
+        rows = await table.query().where(f"pathway_id = '{escaped}'").select(["text"]).limit(1).to_list()
+        if not rows:
             return None
-        return DegreePathway.model_validate_json(results[0].text)
+        pathway = DegreePathway.model_validate_json(rows[0]["text"])
+
+        if self._pathway_cache_version == version:
+            self._pathway_cache[pathway_id] = pathway
+            while len(self._pathway_cache) > settings.pathway_cache_size:
+                self._pathway_cache.popitem(last=False)
+        return pathway
+
+    async def sync_pathways(self, pathways: list[DegreePathway], pipeline: EmbeddingPipeline | None = None) -> IngestReport:
+        """Upsert changed pathways by pathway_id and delete the ones no longer given."""
+        if "pathways" not in self.db.table_names():
+            self.db.create_table("pathways", schema=DegreePathwayLance)
+        self.migrate()
+        table = self.db.open_table("pathways")
+        rows = [pathway_to_lance(p) for p in pathways]
+        report = await sync_table(table, "pathway_id", rows, pipeline or get_embedding_pipeline(self.func))
+        self.create_id_index()
+        return report
+
+    def create_id_index(self) -> None:
+        """BTREE index so lookups by pathway_id do not scan the table."""
+        self.db.open_table("pathways").create_scalar_index("pathway_id", index_type="BTREE", replace=True)
+
+    def migrate(self) -> int:
+        """
+        Rewrite a pathways table from before the metadata columns existed, filling
+        them from the stored documents and keeping the existing vectors.
+        """
+        table = self.db.open_table("pathways")
+        if "program_name" in table.schema.names:
+            return 0
+        data = table.to_arrow().select(["pathway_id", "text", "vector"]).to_pylist()
+        rows = []
+        for row in data:
+            pathway = DegreePathway.model_validate_json(row["text"])
+            rows.append(
+                {
+                    **pathway_to_lance(pathway),
+                    "pathway_id": row["pathway_id"],
+                    "text": row["text"],
+                    "content_hash": content_hash(row["text"]),
+                    "vector": row["vector"],
+                }
+            )
+        self.db.create_table("pathways", data=rows, schema=DegreePathwayLance, mode="overwrite")
+        self.create_id_index()
+        return len(rows)
 
 def get_pathway_db() -> PathwayVectorDb:
     return PathwayVectorDb(_db, _func)
 
+class QueryEmbedder:
+    """Embeds a user query once so every search in a request can share the vector."""
+
+    def __init__(self, func: EmbeddingFunction):
+        self.func = func
+
+    async def embed(self, text: str) -> list[float]:
+        # The embedding client is synchronous, keep it off the event loop.
+        embeddings = await asyncio.to_thread(self.func.compute_query_embeddings_with_retry, text)
+        return list(embeddings[0])
+
+def get_query_embedder() -> QueryEmbedder:
+    return QueryEmbedder(_func)
+
 class UHCourseLance(UHCourse, LanceModel):
     text: str = _func.SourceField()
+    content_hash: Optional[str] = None
     vector: Vector(_func.ndims()) = _func.VectorField()
 
+_COURSE_COLUMNS = list(UHCourse.model_fields)
+# CourseQuery filters that match a handful of courses, see CourseVectorDb._lance_similar_courses.
+_SELECTIVE_FILTERS = ("subject_code", "course_number", "course_suffix", "designations")
+
 class UHCourseAdd(UHCourse):
     text: str
+    content_hash: str
 
 def course_to_lance(course: UHCourse) -> UHCourseLance:
-    return UHCourseAdd(**course.model_dump(), text=course.model_dump_json(indent=2))
+    text = course.model_dump_json(indent=2)
+    return UHCourseAdd(**course.model_dump(), text=text, content_hash=content_hash(text))
+
+CourseRetrievalBackend = Literal["lance", "numpy"]
 
 class CourseVectorDb:
-    def __init__(self, db: DBConnection, func: EmbeddingFunction):
+    def __init__(self, db: DBConnection, func: EmbeddingFunction, backend: CourseRetrievalBackend = "lance"):
         self.db = db
         self.func = func
+        self.backend = backend
         self._async_db: Optional[AsyncConnection] = None
         self._async_table: Optional[AsyncTable] = None
         self._async_table_lock: Optional[asyncio.Lock] = None
+        self._index: Optional[InMemoryCourseIndex] = None
+        self._index_lock: Optional[asyncio.Lock] = None
+        # Shared by every request in the process, so concurrent pathways cannot fan out unbounded.
+        self._search_semaphore: Optional[asyncio.Semaphore] = None
+        # Ids and vectors of precomputed candidate sets, by table version and filter.
+        self._candidate_vectors_cache: OrderedDict[tuple[int, str], tuple[list[str], np.ndarray]] = OrderedDict()
+        self._candidate_vectors_bytes = 0
+        self._candidate_vectors_inflight: dict[tuple[int, str], asyncio.Task] = {}
         self._db_uri = db.uri
 
         if "courses" not in self.db.table_names():
             self.db.create_table("courses", schema=UHCourseLance)
             print("Created Course Vector DB")
 
-    async def query(self, text: str, query: CourseQueryBase, pathway_course: PathwayCourse, k: int = 10, n: int = 1):
+    async def query(
+            self,
+            text: str,
+            query: CourseQueryBase,
+            pathway_course: PathwayCourse,
+            k: int = 10,
+            n: int = 1,
+            vector: Optional[list[float]] = None,
+    ):
         # return self.get_similar_courses(query=CourseQuery(course_number_gte=100, k=k, n=n))
 
         # agent = get_query_builder_agent()
-        query_base: CourseQueryBase = query
+        query = self.build_query(text, query, pathway_course, k=k, n=n, vector=vector)
+        # print(query)
+        # print(query.model_dump_json(indent=2))
 
-        query = CourseQuery(
+        return await self.get_similar_courses(query=query)
+
+    @staticmethod
+    def build_query(
+            text: str,
+            query_base: CourseQueryBase,
+            pathway_course: PathwayCourse,
+            k: int = 10,
+            n: int = 1,
+            vector: Optional[list[float]] = None,
+            inst_ipeds: Optional[int] = None,
+    ) -> CourseQuery:
+        return CourseQuery(
             subject_code=query_base.subject_code,
             course_number=query_base.course_number,
             course_number_gte=query_base.course_number_gte,
             course_suffix=query_base.course_suffix,
             designations=query_base.designations,
             query=text,
+            vector=vector,
             credits=pathway_course.credits,
+            inst_ipeds=inst_ipeds,
             k=k,
             n=n,
         )
-        # print(query)
-        # print(query.model_dump_json(indent=2))
 
-        return await self.get_similar_courses(query=query)
+    async def warm_up(self) -> None:
+        await self._get_async_table()
+        if self.backend == "numpy":
+            await self.get_index()
 
     async def _get_async_table(self) -> AsyncTable:
         if self._async_table is not None:
@@ -119,19 +431,88 @@ class CourseVectorDb:
         async with self._async_table_lock:
             if self._async_table is None:
                 if self._async_db is None:
-                    self._async_db = await lancedb.connect_async(self._db_uri)
+                    self._async_db = await _connect_async(self._db_uri)
                 self._async_table = await self._async_db.open_table("courses")
         return self._async_table
 
-    async def get_similar_courses(self, query: CourseQuery) -> list[UHCourse]:
+    async def get_index(self) -> InMemoryCourseIndex:
         table = await self._get_async_table()
+        if self._index is not None and self._index.version == await table.version():
+            return self._index
+
+        if self._index_lock is None:
+            self._index_lock = asyncio.Lock()
+
+        async with self._index_lock:
+            version = await table.version()
+            if self._index is None or self._index.version != version:
+                self._index = await InMemoryCourseIndex.load(table)
+                print(f"Loaded {len(self._index)} courses into the in-memory index (version {version})")
+        return self._index
 
-        if query.query:
-            q = await table.search(query.query, query_type="vector")
+    async def _with_vector(self, query: CourseQuery) -> CourseQuery:
+        if query.vector is None and query.query:
+            embeddings = await asyncio.to_thread(self.func.compute_query_embeddings_with_retry, query.query)
+            return query.model_copy(update={"vector": list(embeddings[0])})
+        return query
+
+    async def get_similar_courses(self, query: CourseQuery) -> list[UHCourse]:
+        return (await self.get_similar_courses_many([query]))[0]
+
+    @staticmethod
+    def _query_key(query: CourseQuery) -> tuple:
+        return query.model_copy(update={"vector": None}).model_dump_json(), tuple(query.vector or ())
+
+    async def get_similar_courses_many(self, queries: list[CourseQuery]) -> list[list[UHCourse]]:
+        """
+        Results for each query, in order. Identical queries in the batch are searched
+        once, and on the Lance backend at most course_search_concurrency searches run
+        at a time across the whole process.
+        """
+        return [list(results) for results in await asyncio.gather(*self.search_similar_courses(queries))]
+
+    def search_similar_courses(self, queries: list[CourseQuery]) -> list[asyncio.Future]:
+        """
+        Start the searches of get_similar_courses_many and return a future per query,
+        so callers can use each result as soon as its search finishes. Identical
+        queries share a future. The NumPy backend still answers them all at once.
+        """
+        distinct: dict[tuple, CourseQuery] = {}
+        keys = []
+        for query in queries:
+            key = self._query_key(query)
+            distinct.setdefault(key, query)
+            keys.append(key)
+
+        if self.backend == "numpy":
+            batch = asyncio.ensure_future(self._numpy_similar_courses(list(distinct.values())))
+            searches = [asyncio.ensure_future(self._nth_result(batch, i)) for i in range(len(distinct))]
         else:
-            q = await table.search()
+            if self._search_semaphore is None:
+                self._search_semaphore = asyncio.Semaphore(settings.course_search_concurrency)
+            searches = [asyncio.ensure_future(self._bounded_lance_similar_courses(q)) for q in distinct.values()]
+        by_key = dict(zip(distinct, searches))
+        return [by_key[key] for key in keys]
+
+    async def _numpy_similar_courses(self, queries: list[CourseQuery]) -> list[list[UHCourse]]:
+        index = await self.get_index()
+        queries = [await self._with_vector(q) for q in queries]
+        # Tens of milliseconds of NumPy per pathway, kept off the event loop.
+        return await asyncio.to_thread(index.search_many, queries)
+
+    @staticmethod
+    async def _nth_result(batch: asyncio.Future, n: int) -> list[UHCourse]:
+        return (await batch)[n]
+
+    async def _bounded_lance_similar_courses(self, query: CourseQuery) -> list[UHCourse]:
+        async with self._search_semaphore:
+            return await self._lance_similar_courses(query)
 
+    @staticmethod
+    def _where_clause(query: CourseQuery) -> str:
         wheres: list[str] = []
+        if query.inst_ipeds is not None:
+            wheres.append(f"inst_ipeds = {query.inst_ipeds}")
         if query.credits:
             wheres.append(f"num_units.min <= {query.credits} AND num_units.max >= {query.credits}")
         if query.subject_code:
@@ -145,20 +526,99 @@ class CourseVectorDb:
         if query.designations:
             lits = ", ".join(f"'{s}'" for s in query.designations)
             wheres.append(f"array_has_any(designations, [{lits}])")
-        where_clause = " AND ".join(wheres)
+        if query.course_ids is not None:
+            wheres.append(f"course_id IN ({_id_list(query.course_ids)})")
+        return " AND ".join(wheres)
+
+    async def _lance_similar_courses(self, query: CourseQuery) -> list[UHCourse]:
+        if query.course_ids is not None and not query.course_ids:
+            return []
+        if query.course_ids is not None and query.vector is not None:
+            return await self._lance_rank_candidates(query)
+
+        # Selective filters leave too few matching rows in the probed IVF partitions,
+        # so those searches scan the filtered rows exactly instead of using the index.
+        exact = any(getattr(query, f) for f in _SELECTIVE_FILTERS)
+        results = await self._lance_search(query, exact)
+        searched_vectors = query.vector is not None or bool(query.query)
+        if searched_vectors and not exact and len(results) < (query.k or 10) and self._where_clause(query):
+            # The ANN search came back short of k under a prefilter, check with a flat scan.
+            results = await self._lance_search(query, exact=True)
+        return results
+
+    async def _lance_search(self, query: CourseQuery, exact: bool) -> list[UHCourse]:
+        table = await self._get_async_table()
+
+        # _distance is selected explicitly, otherwise Lance warns that it adds it implicitly.
+        columns = [*_COURSE_COLUMNS, "_distance"]
+        if query.vector is not None or query.query:
+            q = await table.search(query.vector if query.vector is not None else query.query, query_type="vector")
+            q = q.bypass_vector_index() if exact else _tune_vector_query(q)
+        else:
+            q = table.query()
+            columns = _COURSE_COLUMNS
+
+        where_clause = self._where_clause(query)
         if where_clause:
             q = q.where(where_clause)
 
         k = query.k or 10
         q = q.limit(k)
-        rows = await q.to_list()
-        field_names = set(UHCourseLance.field_names())
-        results = [
-            UHCourseLance(**{k: v for k, v in row.items() if k in field_names})
-            for row in rows
-        ]
-
-        return [UHCourse.model_validate_json(r.model_dump_json(), extra="ignore") for r in results]
+        return courses_from_arrow(await q.select(columns).to_arrow())
+
+    async def _lance_rank_candidates(self, query: CourseQuery) -> list[UHCourse]:
+        """
+        Rank a precomputed candidate set by scoring its vectors directly, the
+        same L2 order as the flat search. The set's ids and vectors come from one
+        scalar lookup (BTREE on course_id) and are cached per table version, so
+        a repeat costs a small matrix-vector product plus fetching the top k rows.
+        """
+        table = await self._get_async_table()
+        ids, vectors = await self._candidate_vectors(table, query)
+        if not ids:
+            return []
+        q = np.asarray(query.vector, dtype=np.float32)
+        distances = np.einsum("ij,ij->i", vectors - q, vectors - q)
+        top = [ids[i] for i in np.argsort(distances, kind="stable")[:query.k or 10]]
+
+        data = await table.query().where(f"course_id IN ({_id_list(top)})").select(_COURSE_COLUMNS).to_arrow()
+        by_id = {course.course_id: course for course in courses_from_arrow(data)}
+        return [by_id[course_id] for course_id in top if course_id in by_id]
+
+    async def _candidate_vectors(self, table: AsyncTable, query: CourseQuery) -> tuple[list[str], np.ndarray]:
+        where_clause = self._where_clause(query)
+        key = (await table.version(), where_clause)
+        entry = self._candidate_vectors_cache.get(key)
+        if entry is not None:
+            self._candidate_vectors_cache.move_to_end(key)
+            return entry
+
+        # Concurrent misses for the same candidates share one scan.
+        task = self._candidate_vectors_inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._load_candidate_vectors(table, key))
+            self._candidate_vectors_inflight[key] = task
+        return await asyncio.shield(task)
+
+    async def _load_candidate_vectors(self, table: AsyncTable, key: tuple[int, str]) -> tuple[list[str], np.ndarray]:
+        try:
+            where_clause = key[1]
+            data = await table.query().where(f"{where_clause} AND vector IS NOT NULL").select(["course_id", "vector"]).to_arrow()
+            ids = data["course_id"].to_pylist()
+            vectors = np.asarray(data["vector"].combine_chunks().flatten(), dtype=np.float32).reshape(len(ids), -1)
+            entry = (ids, vectors)
+
+            previous = self._candidate_vectors_cache.pop(key, None)
+            if previous is not None:
+                self._candidate_vectors_bytes -= previous[1].nbytes
+            self._candidate_vectors_cache[key] = entry
+            self._candidate_vectors_bytes += vectors.nbytes
+            while self._candidate_vectors_bytes > settings.candidate_vector_cache_max_bytes and self._candidate_vectors_cache:
+                _, (_, evicted) = self._candidate_vectors_cache.popitem(last=False)
+                self._candidate_vectors_bytes -= evicted.nbytes
+            return entry
+        finally:
+            self._candidate_vectors_inflight.pop(key, None)
 
     def clear(self):
         self.db.drop_table("courses")
@@ -166,10 +626,124 @@ class CourseVectorDb:
     def add_courses(self, courses: list[UHCourse], chunk_size: int = 1000):
         chunks = [courses[i:i + chunk_size] for i in range(0, len(courses), chunk_size)]
         table = self.db.open_table("courses")
+        ensure_content_hash_column(table)
         for chunk in chunks:
-            table.add([course_to_lance(c).model_dump() for c in chunk])
+            rows = [course_to_lance(c).model_dump() for c in chunk]
+            # Embed through our own function so existing tables also go through the cache.
+            vectors = self.func.compute_source_embeddings_with_retry([r["text"] for r in rows])
+            for row, vector in zip(rows, vectors):
+                row["vector"] = vector
+            table.add(rows)
             print(".", end="")
         print()
+        print(f"embedding cache: {get_embedding_cache().stats()}")
+
+    async def sync_courses(self, courses: list[UHCourse], pipeline: EmbeddingPipeline | None = None) -> IngestReport:
+        """Upsert changed courses by course_id and delete the ones no longer given."""
+        table = self.db.open_table("courses")
+        rows = [course_to_lance(c).model_dump() for c in courses]
+        report = await sync_table(table, "course_id", rows, pipeline or get_embedding_pipeline(self.func))
+        print(f"embedding cache: {get_embedding_cache().stats()}")
+        return report
+
+class RequirementCandidatesLance(LanceModel):
+    pathway_id: str
+    position: int
+    name: str
+    credits: int
+    # None means the requirement matches too much of the catalog to be worth storing.
+    course_ids: Optional[list[str]]
+
+class RequirementCandidates(NamedTuple):
+    """The candidate set stored for one requirement position, with the requirement it was resolved for."""
+    name: str
+    credits: int
+    course_ids: Optional[list[str]]
+
+
+class CandidateStore:
+    """
+    Precomputed candidate course ids for every requirement of every stored pathway,
+    written by `python -m backend.manage precompute-candidates`. Reloaded when the
+    table version changes, so a new precompute run is picked up without a restart.
+    """
+
+    table_name = "requirement_candidates"
+
+    def __init__(self, db: DBConnection):
+        self._db_uri = db.uri
+        self._async_db: Optional[AsyncConnection] = None
+        self._table: Optional[AsyncTable] = None
+        self._version: Optional[int] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._sets: dict[str, list[RequirementCandidates]] = {}
+        # When the table was last found missing. Listing tables hits storage, so
+        # until precompute-candidates runs it is re-checked only as often as open
+        # tables look for writes from other processes.
+        self._absent_at: Optional[float] = None
+
+    def _absent(self) -> bool:
+        if self._absent_at is None:
+            return False
+        interval = settings.lance_read_consistency_seconds
+        return interval is None or time.monotonic() - self._absent_at < interval
+
+    async def _get_table(self) -> Optional[AsyncTable]:
+        if self._table is None:
+            if self._absent():
+                return None
+            if self._async_db is None:
+                self._async_db = await _connect_async(self._db_uri)
+            if self.table_name not in await self._async_db.table_names():
+                self._absent_at = time.monotonic()
+                return None
+            self._absent_at = None
+            self._table = await self._async_db.open_table(self.table_name)
+        return self._table
+
+    async def load(self) -> None:
+        table = await self._get_table()
+        if table is None:
+            print("No precomputed requirement candidates, using filtered search")
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            version = await table.version()
+            if version == self._version:
+                return
+            rows = await table.query().to_list()
+            sets: dict[str, list[tuple[int, RequirementCandidates]]] = {}
+            for row in rows:
+                sets.setdefault(row["pathway_id"], []).append(
+                    (row["position"], RequirementCandidates(row["name"], row["credits"], row["course_ids"]))
+                )
+            self._sets = {pid: [c for _, c in sorted(items, key=lambda x: x[0])] for pid, items in sets.items()}
+            self._version = version
+            print(f"Loaded requirement candidates for {len(self._sets)} pathways (version {version})")
+
+    async def get(self, pathway_id: str) -> Optional[list[RequirementCandidates]]:
+        table = await self._get_table()
+        if table is None:
+            return None
+        if await table.version() != self._version:
+            await self.load()
+        return self._sets.get(pathway_id)
+
+    async def replace(self, rows: list[RequirementCandidatesLance]) -> None:
+        async_db = await _connect_async(self._db_uri)
+        await async_db.create_table(
+            self.table_name,
+            data=[r.model_dump() for r in rows] if rows else None,
+            schema=RequirementCandidatesLance,
+            mode="overwrite",
+        )
+        self._table = None
+        self._absent_at = None
+        await self.load()
+
+def get_candidate_store() -> CandidateStore:
+    return CandidateStore(_db)
 
 def get_course_db() -> CourseVectorDb:
-    return CourseVectorDb(_db, _func)
+    return CourseVectorDb(_db, _func, backend=settings.course_retrieval_backend)
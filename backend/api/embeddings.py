@@ -0,0 +1,133 @@
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+from lancedb.embeddings import register
+from lancedb.embeddings.openai import OpenAIEmbeddings
+
+from backend.api.settings import settings
+
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding store keyed by model name plus a hash of the text.
+    Lookups go through an in-process LRU first, then a SQLite file shared by
+    ingestion scripts and every API worker.
+    """
+
+    def __init__(self, path: str | Path, max_memory_items: int = 10_000):
+        self.path = Path(path)
+        self.max_memory_items = max_memory_items
+        self._memory: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, model TEXT NOT NULL, vector BLOB NOT NULL)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def key(model: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def get_many(self, model: str, texts: list[str]) -> list[Optional[list[float]]]:
+        keys = [self.key(model, t) for t in texts]
+        found: dict[str, np.ndarray] = {}
+
+        with self._lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+                    self.memory_hits += 1
+
+            pending = list({key for key in keys if key not in found})
+            # SQLite caps the number of bound parameters per statement.
+            for i in range(0, len(pending), 500):
+                batch = pending[i:i + 500]
+                placeholders = ", ".join("?" for _ in batch)
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    vector = np.frombuffer(blob, dtype=np.float32)
+                    self._remember(key, vector)
+                    found[key] = vector
+                    self.disk_hits += 1
+
+            self.misses += sum(1 for key in keys if key not in found)
+
+        return [found[key].tolist() if key in found else None for key in keys]
+
+    def put_many(self, model: str, texts: list[str], vectors: list[list[float]]) -> None:
+        rows = []
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                key = self.key(model, text)
+                array = np.asarray(vector, dtype=np.float32)
+                self._remember(key, array)
+                rows.append((key, model, array.tobytes()))
+            self._conn.executemany("INSERT OR IGNORE INTO embeddings (key, model, vector) VALUES (?, ?, ?)", rows)
+            self._conn.commit()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "memory_items": len(self._memory),
+        }
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    global _cache
+    # Ingestion embeds from several threads at once, only one of them may open the file.
+    with _cache_lock:
+        if _cache is None:
+            _cache = EmbeddingCache(settings.embedding_cache_path, settings.embedding_cache_memory_items)
+    return _cache
+
+
+@register("openai-cached")
+class CachedOpenAIEmbeddings(OpenAIEmbeddings):
+    """OpenAI embeddings that only call the API for texts missing from the EmbeddingCache."""
+
+    def _cache_model(self) -> str:
+        return f"{self.name}:{self.dim}" if self.dim else self.name
+
+    def generate_embeddings(self, texts) -> list:
+        texts = list(texts)
+        cache = get_embedding_cache()
+        model = self._cache_model()
+        vectors = cache.get_many(model, texts)
+
+        missing = [i for i, v in enumerate(vectors) if v is None and texts[i]]
+        if missing:
+            fresh = super().generate_embeddings([texts[i] for i in missing])
+            computed = [(i, v) for i, v in zip(missing, fresh) if v is not None]
+            for i, v in computed:
+                vectors[i] = v
+            cache.put_many(model, [texts[i] for i, _ in computed], [v for _, v in computed])
+
+        return vectors
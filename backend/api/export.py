@@ -0,0 +1,81 @@
+import asyncio
+import re
+import tempfile
+import zipfile
+from pathlib import Path
+from typing import AsyncIterator
+
+from backend.api.models import CompleteDegreePathway
+from backend.api.pdf import merge_pathway_pdfs
+
+_CHUNK_SIZE = 1 << 16
+
+
+def export_filename(program_name: str, extension: str = "pdf") -> str:
+    slug = re.sub(r"[^a-zA-Z0-9]+", "-", program_name or "").strip("-").lower()
+    if not slug:
+        slug = "degree-pathway"
+    return f"{slug}.{extension}"
+
+
+def _unique_name(title: str, seen: dict[str, int]) -> str:
+    """A PDF filename for a plan, numbered when an earlier plan had the same program name."""
+    name = export_filename(title)
+    seen[name] = seen.get(name, 0) + 1
+    if seen[name] > 1:
+        name = f"{name[:-4]}-{seen[name]}.pdf"
+    return name
+
+
+class _ChunkSink:
+    """Write-only file for ZipFile. Without seek or tell, ZipFile writes data descriptors and can stream."""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+async def zip_stream(pdfs: AsyncIterator[tuple[CompleteDegreePathway, bytes]]) -> AsyncIterator[bytes]:
+    """A ZIP with one PDF per plan, each sent as soon as it is rendered."""
+    sink = _ChunkSink()
+    seen: dict[str, int] = {}
+    # Stored, not deflated: the PDF streams are already compressed.
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED) as archive:
+        async for plan, pdf in pdfs:
+            archive.writestr(_unique_name(plan.program_name, seen), pdf)
+            yield sink.drain()
+    yield sink.drain()
+
+
+async def merged_stream(pdfs: AsyncIterator[tuple[CompleteDegreePathway, bytes]]) -> AsyncIterator[bytes]:
+    """
+    One PDF with a table of contents. The contents need every page count, so
+    nothing can be sent before the last plan is rendered: PDFs are spooled to
+    a temporary directory as they arrive, merged there, and the result is
+    streamed from disk. The merge itself builds the whole document in memory
+    (O(total size), see merge_pathway_pdfs); the ZIP format is the one that
+    streams in constant memory.
+    """
+    with tempfile.TemporaryDirectory(prefix="pathway-export-") as directory:
+        parts: list[tuple[str, Path]] = []
+        async for plan, pdf in pdfs:
+            path = Path(directory) / f"{len(parts)}.pdf"
+            await asyncio.to_thread(path.write_bytes, pdf)
+            parts.append((plan.program_name, path))
+
+        merged = Path(directory) / "merged.pdf"
+        await asyncio.to_thread(merge_pathway_pdfs, parts, merged)
+        with merged.open("rb") as file:
+            while chunk := await asyncio.to_thread(file.read, _CHUNK_SIZE):
+                yield chunk
@@ -0,0 +1,215 @@
+import asyncio
+import hashlib
+import random
+import time
+from collections import deque
+from typing import Callable
+
+import pyarrow as pa
+from lancedb.embeddings import EmbeddingFunction
+from lancedb.table import LanceTable
+from pydantic import BaseModel
+
+from backend.api.settings import settings
+from backend.api.tokens import estimate_tokens
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def ensure_content_hash_column(table: LanceTable) -> None:
+    """Tables created before content hashes existed get an empty one, which never matches."""
+    if "content_hash" not in table.schema.names:
+        table.add_columns({"content_hash": "''"})
+
+
+def _quote(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+class RateLimiter:
+    """Keeps requests and tokens under per-minute limits over a sliding 60 second window."""
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int, window: float = 60.0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.window = window
+        self._events: deque[tuple[float, int]] = deque()
+        self._tokens = 0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: int) -> None:
+        # A single batch larger than the whole budget still has to go through eventually.
+        tokens = min(tokens, self.tokens_per_minute)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                while self._events and now - self._events[0][0] >= self.window:
+                    _, spent = self._events.popleft()
+                    self._tokens -= spent
+                if len(self._events) < self.requests_per_minute and self._tokens + tokens <= self.tokens_per_minute:
+                    self._events.append((now, tokens))
+                    self._tokens += tokens
+                    return
+                await asyncio.sleep(self._events[0][0] + self.window - now)
+
+
+class EmbeddingPipeline:
+    """
+    Embeds rows in batches, several in flight at once under a RateLimiter, and
+    hands every finished batch to a single writer while later batches are still
+    embedding. Failed batches are retried with exponential backoff and jitter.
+    """
+
+    def __init__(
+            self,
+            func: EmbeddingFunction,
+            batch_size: int = 256,
+            concurrency: int = 4,
+            limiter: RateLimiter | None = None,
+            max_retries: int = 6,
+            max_backoff: float = 60.0,
+    ):
+        self.func = func
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.limiter = limiter or RateLimiter(
+            settings.embedding_requests_per_minute,
+            settings.embedding_tokens_per_minute,
+        )
+        self.max_retries = max_retries
+        self.max_backoff = max_backoff
+
+    async def embed(self, texts: list[str]) -> list:
+        tokens = sum(estimate_tokens(t) for t in texts)
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.acquire(tokens)
+            try:
+                return await asyncio.to_thread(self.func.compute_source_embeddings, texts)
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = min(self.max_backoff, 2 ** attempt) * (1 + random.random())
+                print(f"WARNING: embedding batch of {len(texts)} failed ({e}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def run(self, rows: list[dict], write: Callable[[list[dict]], None]) -> None:
+        """Set row["vector"] from row["text"] and call write (in a thread) once per batch."""
+        queue: asyncio.Queue[list[dict] | None] = asyncio.Queue(maxsize=self.concurrency)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def embed_batch(batch: list[dict]) -> None:
+            async with semaphore:
+                vectors = await self.embed([row["text"] for row in batch])
+            for row, vector in zip(batch, vectors):
+                row["vector"] = vector
+            await queue.put(batch)
+
+        async def writer() -> None:
+            while (batch := await queue.get()) is not None:
+                await asyncio.to_thread(write, batch)
+
+        batches = [rows[i:i + self.batch_size] for i in range(0, len(rows), self.batch_size)]
+        producers = asyncio.gather(*(embed_batch(batch) for batch in batches))
+        writer_task = asyncio.create_task(writer())
+        try:
+            done, _ = await asyncio.wait({producers, writer_task}, return_when=asyncio.FIRST_COMPLETED)
+            if writer_task in done:
+                # The writer only stops early when a write failed.
+                producers.cancel()
+                await asyncio.gather(producers, return_exceptions=True)
+                writer_task.result()
+            await producers
+            await queue.put(None)
+            await writer_task
+        finally:
+            producers.cancel()
+            writer_task.cancel()
+
+
+def get_embedding_pipeline(func: EmbeddingFunction, batch_size: int | None = None, concurrency: int | None = None) -> EmbeddingPipeline:
+    return EmbeddingPipeline(
+        func,
+        batch_size=batch_size or settings.embedding_batch_size,
+        concurrency=concurrency or settings.embedding_concurrency,
+        max_retries=settings.embedding_max_retries,
+    )
+
+
+class IngestReport(BaseModel):
+    table: str
+    total: int
+    inserted: int
+    updated: int
+    unchanged: int
+    deleted: int
+    embedded: int
+    seconds: float
+
+    @property
+    def throughput(self) -> float:
+        """Records checked per second."""
+        return self.total / self.seconds if self.seconds else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.table}: {self.total} records, {self.inserted} inserted, {self.updated} updated, "
+            f"{self.unchanged} unchanged, {self.deleted} deleted, {self.embedded} embedded "
+            f"in {self.seconds:.2f}s ({self.throughput:.0f} records/s)"
+        )
+
+
+async def sync_table(
+        table: LanceTable,
+        id_column: str,
+        rows: list[dict],
+        pipeline: EmbeddingPipeline,
+        delete_missing: bool = True,
+) -> IngestReport:
+    """
+    Make the table hold exactly the given rows. Every row carries its embedding
+    text and content_hash; only rows whose id is new or whose hash changed are
+    embedded and upserted, and ids missing from rows are deleted. Running it twice
+    with the same input does nothing the second time.
+    """
+    started = time.perf_counter()
+    ensure_content_hash_column(table)
+
+    existing = table.search().select([id_column, "content_hash"]).limit(None).to_arrow().to_pylist()
+    stored = {row[id_column]: row["content_hash"] for row in existing}
+
+    by_id: dict[str, dict] = {}
+    for row in rows:
+        if row[id_column] in by_id:
+            print(f"WARNING: duplicate {id_column} {row[id_column]}, keeping the last record")
+        by_id[row[id_column]] = row
+
+    changed = [row for key, row in by_id.items() if stored.get(key) != row["content_hash"]]
+    inserted = sum(1 for row in changed if row[id_column] not in stored)
+
+    def upsert(batch: list[dict]) -> None:
+        (
+            table.merge_insert(id_column)
+            .when_matched_update_all()
+            .when_not_matched_insert_all()
+            .execute(pa.Table.from_pylist(batch, schema=table.schema))
+        )
+
+    await pipeline.run(changed, upsert)
+
+    removed = [key for key in stored if key not in by_id] if delete_missing else []
+    for i in range(0, len(removed), 1000):
+        ids = ", ".join(_quote(key) for key in removed[i:i + 1000])
+        table.delete(f"{id_column} IN ({ids})")
+
+    return IngestReport(
+        table=table.name,
+        total=len(by_id),
+        inserted=inserted,
+        updated=len(changed) - inserted,
+        unchanged=len(by_id) - len(changed),
+        deleted=len(removed),
+        embedded=len(changed),
+        seconds=time.perf_counter() - started,
+    )
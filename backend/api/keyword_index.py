@@ -0,0 +1,116 @@
+import bisect
+import math
+import re
+import unicodedata
+from collections import Counter
+
+import numpy as np
+
+from backend.api.models import DegreePathway, flatten_pathway_courses
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase ASCII word tokens, so "Mānoa" and "manoa" are the same term."""
+    normalized = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+    return _TOKEN.findall(normalized.lower())
+
+
+class PathwayKeywordIndex:
+    """
+    BM25 inverted index over pathway program names, institutions and course names.
+    Program names are repeated name_weight times so "computer science" ranks the
+    Computer Science degree above pathways that merely list an ICS course. Every
+    query token also matches terms it is a prefix of ("comp" -> "computer"), at a
+    reduced weight, so results show up while the user is still typing.
+    """
+
+    def __init__(
+            self,
+            pathways: list[DegreePathway],
+            version: int | None = None,
+            k1: float = 1.2,
+            b: float = 0.75,
+            name_weight: int = 3,
+            prefix_weight: float = 0.5,
+            max_prefix_terms: int = 50,
+    ):
+        self.version = version
+        self.k1 = k1
+        self.b = b
+        self.prefix_weight = prefix_weight
+        self.max_prefix_terms = max_prefix_terms
+        self.pathways = pathways
+
+        postings: dict[str, tuple[list[int], list[int]]] = {}
+        lengths = []
+        for doc, pathway in enumerate(pathways):
+            tokens = tokenize(pathway.program_name) * name_weight + tokenize(pathway.institution)
+            for course in flatten_pathway_courses(pathway):
+                tokens.extend(tokenize(course.name))
+            lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                docs, tfs = postings.setdefault(term, ([], []))
+                docs.append(doc)
+                tfs.append(tf)
+
+        self._doc_lengths = np.array(lengths, dtype=np.float64)
+        self._avg_length = float(self._doc_lengths.mean()) if lengths else 0.0
+        self._postings = {
+            term: (np.array(docs, dtype=np.int64), np.array(tfs, dtype=np.float64))
+            for term, (docs, tfs) in postings.items()
+        }
+        n = len(pathways)
+        self._idf = {
+            term: math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, (docs, _) in self._postings.items()
+        }
+        self._vocabulary = sorted(self._postings)
+
+    def __len__(self) -> int:
+        return len(self.pathways)
+
+    def _expand(self, token: str) -> list[tuple[str, float]]:
+        """The token itself plus the vocabulary terms it is a prefix of."""
+        terms = [(token, 1.0)] if token in self._postings else []
+        start = bisect.bisect_left(self._vocabulary, token)
+        for term in self._vocabulary[start:start + self.max_prefix_terms + 1]:
+            if not term.startswith(token):
+                break
+            if term != token:
+                terms.append((term, self.prefix_weight))
+        return terms
+
+    def scores(self, query: str) -> np.ndarray:
+        scores = np.zeros(len(self.pathways), dtype=np.float64)
+        if not self.pathways:
+            return scores
+        norm = self.k1 * (1 - self.b + self.b * self._doc_lengths / self._avg_length)
+        for token in set(tokenize(query)):
+            for term, weight in self._expand(token):
+                docs, tfs = self._postings[term]
+                scores[docs] += weight * self._idf[term] * tfs * (self.k1 + 1) / (tfs + norm[docs])
+        return scores
+
+    def search(self, query: str, limit: int = 8) -> list[tuple[DegreePathway, float]]:
+        """Matching pathways, best first."""
+        scores = self.scores(query)
+        matches = np.flatnonzero(scores > 0)
+        order = matches[np.lexsort((matches, -scores[matches]))][:limit]
+        return [(self.pathways[i], float(scores[i])) for i in order]
+
+
+def reciprocal_rank_fusion(rankings: list[list[DegreePathway]], k: int = 60) -> list[DegreePathway]:
+    """
+    Merge ranked lists by summing 1 / (k + rank) for every list a pathway appears in.
+    Ties keep the order of the earlier lists.
+    """
+    scores: dict[str, float] = {}
+    pathways: dict[str, DegreePathway] = {}
+    for ranking in rankings:
+        for rank, pathway in enumerate(ranking, start=1):
+            scores[pathway.pathway_id] = scores.get(pathway.pathway_id, 0.0) + 1.0 / (k + rank)
+            pathways.setdefault(pathway.pathway_id, pathway)
+    order = sorted(pathways, key=lambda pid: -scores[pid])
+    return [pathways[pid] for pid in order]
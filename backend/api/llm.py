@@ -1,6 +1,13 @@
+import difflib
+import fcntl
 import json
+import math
+import os
+import re
+import tempfile
+import unicodedata
 from pathlib import Path
-from typing import runtime_checkable, Protocol, Dict
+from typing import runtime_checkable, Protocol, Dict, Optional
 
 from pydantic_ai import Agent
 from pydantic_ai.models.openai import OpenAIChatModel
@@ -18,7 +25,7 @@ class Query(BaseModel):
 class Queries(BaseModel):
     queries: list[Query]
 
-model = OpenAIChatModel(model_name=settings.openai_llm, provider=OpenAIProvider(api_key=settings.openai_api_key))
+model = OpenAIChatModel(model_name=settings.openai_llm, provider=OpenAIProvider(api_key=settings.openai_api_key, base_url=settings.openai_base_url))
 agent = Agent(model)
 
 query_builder_agent = Agent(model, system_prompt="""Your job is to build up a query to search through a catalog of courses.
@@ -117,8 +124,205 @@ class CachedQueryBuilder(QueryBuilderProtocol):
         # Preserve input order
         return [self._map[name] for name in course_names]
 
+# Course numbers with their suffix letter ("171l"), which must match exactly in fuzzy lookups.
+_NUMBER = re.compile(r"\d+[a-z]?(?![a-z])")
+
+def normalize_course_name(name: str) -> str:
+    """Case, width and spacing insensitive form of a requirement name: "ICS  111 " -> "ics 111"."""
+    name = unicodedata.normalize("NFKC", name).casefold()
+    name = re.sub(r"\s*([/(),+-])\s*", r"\1", name)
+    return " ".join(name.split())
+
+class QueryBuildError(RuntimeError):
+    """The LLM failed to build queries for new course names (an upstream fault, not a bad request)."""
+
+
+class TieredQueryBuilder(CachedQueryBuilder):
+    """
+    Query cache that heals itself instead of failing on unknown names:
+    1. exact lookup by normalized name,
+    2. fuzzy match against known names with exactly the same course numbers and
+       suffixes (difflib ratio), so "Electve" finds "Elective" but "ICS 111"
+       never matches "ICS 211" or "ICS 111L". Known names are bucketed by those
+       numbers and by length, and only lengths that can reach the threshold
+       are compared,
+    3. the names still missing go to the LLMQueryBuilder in concurrent batches,
+       and the answers are merged into the cache file under a lock and written
+       atomically.
+    """
+
+    def __init__(
+            self,
+            cache_path: str | Path = settings.course_query_cache_path,
+            *,
+            llm_builder: Optional[QueryBuilderProtocol] = None,
+            fuzzy_threshold: float = 0.9,
+            preload: bool = True,
+    ):
+        self._llm_builder = llm_builder
+        self.fuzzy_threshold = fuzzy_threshold
+        self._names: list[str] = []
+        self._normalized: Dict[str, CourseQueryBase] = {}
+        self._by_numbers: Dict[tuple[str, ...], Dict[int, list[str]]] = {}
+        # Names with no fuzzy match, forgotten whenever a name is added.
+        self._no_match: set[str] = set()
+        self._llm_lock = asyncio.Lock()
+        self.exact_hits = 0
+        self.fuzzy_hits = 0
+        self.llm_built = 0
+        super().__init__(cache_path, preload=preload)
+
+    def _load_cache(self) -> None:
+        if self.cache_path.exists():
+            super()._load_cache()
+        else:
+            print(f"query cache {self.cache_path} not found, starting empty")
+        self._names = list(self._map)
+        self._normalized = {}
+        self._by_numbers = {}
+        self._no_match = set()
+        for name, query in self._map.items():
+            self._remember(name, query)
+
+    @staticmethod
+    def _numbers(key: str) -> tuple[str, ...]:
+        return tuple(sorted(_NUMBER.findall(key)))
+
+    def _remember(self, name: str, query: CourseQueryBase) -> None:
+        key = normalize_course_name(name)
+        if key not in self._normalized:
+            by_length = self._by_numbers.setdefault(self._numbers(key), {})
+            by_length.setdefault(len(key), []).append(key)
+            self._no_match.clear()
+        self._normalized[key] = query
+
+    def _fuzzy(self, key: str) -> Optional[CourseQueryBase]:
+        if key in self._no_match:
+            return None
+        by_length = self._by_numbers.get(self._numbers(key), {})
+        # ratio = 2 * matches / (len(a) + len(b)) <= 2 * min / sum, which bounds the other length.
+        t = self.fuzzy_threshold
+        shortest, longest = math.ceil(len(key) * t / (2 - t)), math.floor(len(key) * (2 - t) / t)
+        matcher = difflib.SequenceMatcher(b=key)
+        best, best_ratio = None, t
+        for length in range(shortest, longest + 1):
+            for candidate in by_length.get(length, ()):
+                matcher.set_seq1(candidate)
+                if matcher.quick_ratio() < best_ratio:
+                    continue
+                ratio = matcher.ratio()
+                if ratio >= best_ratio:
+                    best, best_ratio = candidate, ratio
+        if best is None:
+            self._no_match.add(key)
+            return None
+        return self._normalized[best]
+
+    def _resolve(self, name: str) -> tuple[Optional[CourseQueryBase], bool]:
+        """The query for a name from the first two tiers, and whether it was an exact hit."""
+        key = normalize_course_name(name)
+        query = self._normalized.get(key)
+        if query is not None:
+            return query, True
+        query = self._fuzzy(key)
+        if query is not None:
+            # Later lookups of this spelling are exact.
+            self._normalized[key] = query
+        return query, False
+
+    def _write_cache(self, entries: Dict[str, CourseQueryBase]) -> list[Query]:
+        """
+        Merge entries into the cache file and replace it in one step, so readers
+        never see a partial file. Other workers and precompute-candidates write
+        the same file, so under a lock the file is read again first and names
+        added there are kept. Returns those names, which this process lacks.
+        """
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        lock_path = self.cache_path.with_name(f"{self.cache_path.name}.lock")
+        with lock_path.open("w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                on_disk: list[Query] = []
+                if self.cache_path.exists():
+                    try:
+                        on_disk = Queries.model_validate_json(self.cache_path.read_bytes()).queries
+                    except ValidationError as e:
+                        print(f"query cache {self.cache_path} is invalid, overwriting it: {e}")
+                known = {q.name for q in on_disk}
+                added = [q for q in on_disk if q.name not in entries]
+                merged = [Query(name=q.name, course_query=entries.get(q.name, q.course_query)) for q in on_disk]
+                merged.extend(Query(name=name, course_query=query) for name, query in entries.items() if name not in known)
+
+                payload = Queries(queries=merged)
+                fd, tmp = tempfile.mkstemp(dir=self.cache_path.parent, prefix=self.cache_path.name, suffix=".tmp")
+                try:
+                    with os.fdopen(fd, "w", encoding="utf-8") as f:
+                        f.write(payload.model_dump_json(indent=2, exclude_none=True))
+                    os.replace(tmp, self.cache_path)
+                except BaseException:
+                    os.unlink(tmp)
+                    raise
+                return added
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    async def _build_missing(self, names: list[str]) -> None:
+        # One LLM round at a time: requests that wait here find the names already built.
+        async with self._llm_lock:
+            missing = list(dict.fromkeys(n for n in names if self._resolve(n)[0] is None))
+            if not missing:
+                return
+            if self._llm_builder is None:
+                self._llm_builder = LLMQueryBuilder()
+            print(f"building {len(missing)} new course queries with the LLM: {missing}")
+            try:
+                queries = await self._llm_builder.build_queries(missing)
+            except Exception as exc:
+                raise QueryBuildError(f"Building course queries failed: {exc}") from exc
+            if len(queries) != len(missing):
+                raise QueryBuildError(f"LLM returned {len(queries)} queries for {len(missing)} course names")
+            for name, query in zip(missing, queries):
+                self._map[name] = query
+                self._names.append(name)
+                self._remember(name, query)
+            self.llm_built += len(missing)
+            entries = {name: self._map[name] for name in self._names}
+            for query in await asyncio.to_thread(self._write_cache, entries):
+                if query.name not in self._map:
+                    self._map[query.name] = query.course_query
+                    self._names.append(query.name)
+                    self._remember(query.name, query.course_query)
+
+    async def build_queries(self, course_names: list[str]) -> list[CourseQueryBase]:
+        queries: list[Optional[CourseQueryBase]] = []
+        for name in course_names:
+            query, exact = self._resolve(name)
+            if query is not None:
+                if exact:
+                    self.exact_hits += 1
+                else:
+                    self.fuzzy_hits += 1
+            queries.append(query)
+
+        missing = [name for name, query in zip(course_names, queries) if query is None]
+        if missing:
+            await self._build_missing(missing)
+            queries = [query or self._resolve(name)[0] for name, query in zip(course_names, queries)]
+        return queries
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "known": len(self._map),
+            "exact_hits": self.exact_hits,
+            "fuzzy_hits": self.fuzzy_hits,
+            "llm_built": self.llm_built,
+        }
+
 def get_query_builder_agent():
     return query_builder_agent
 
 def get_query_builder():
-    return CachedQueryBuilder(cache_path=settings.course_query_cache_path)
+    return TieredQueryBuilder(
+        cache_path=settings.course_query_cache_path,
+        fuzzy_threshold=settings.query_builder_fuzzy_threshold,
+    )
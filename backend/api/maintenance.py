@@ -0,0 +1,136 @@
+import fcntl
+import math
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from lancedb import DBConnection
+from lancedb.table import LanceTable
+from pydantic import BaseModel
+
+from backend.api.settings import settings
+
+# Filter columns of CourseVectorDb._lance_similar_courses, plus the upsert/lookup keys.
+SCALAR_INDEXES: dict[str, dict[str, str]] = {
+    "courses": {
+        "course_id": "BTREE",
+        # Campus partition key, every request filters on it.
+        "inst_ipeds": "BITMAP",
+        "subject_code": "BITMAP",
+        "course_number": "BTREE",
+        "designations": "LABEL_LIST",
+    },
+    "pathways": {
+        "pathway_id": "BTREE",
+    },
+}
+
+
+class MaintenanceReport(BaseModel):
+    table: str
+    rows: int
+    fragments_before: int
+    fragments_after: int
+    vector_index: str | None
+    scalar_indexes: list[str]
+    seconds: float
+
+    def __str__(self) -> str:
+        built = ", ".join(filter(None, [self.vector_index, *self.scalar_indexes])) or "nothing"
+        return (
+            f"{self.table}: {self.rows} rows, {self.fragments_before} -> {self.fragments_after} fragments, "
+            f"built {built} in {self.seconds:.2f}s"
+        )
+
+
+def _indexed_columns(table: LanceTable) -> set[str]:
+    return {column for index in table.list_indices() for column in index.columns}
+
+
+def build_vector_index(table: LanceTable, rebuild: bool = False) -> str | None:
+    """
+    IVF_PQ or HNSW index on the vector column. Small tables are skipped: a flat
+    scan over a few thousand rows is already fast and exact, and PQ needs enough
+    rows to train its codebooks.
+    """
+    index_type = settings.vector_index_type
+    rows = table.count_rows()
+    if index_type == "none" or rows < settings.vector_index_min_rows:
+        return None
+    if not rebuild and "vector" in _indexed_columns(table):
+        return None
+
+    table.create_index(
+        metric="l2",
+        index_type=index_type,
+        num_partitions=settings.vector_index_partitions or max(1, round(math.sqrt(rows))),
+        num_sub_vectors=settings.vector_index_sub_vectors,
+        m=settings.vector_index_hnsw_m,
+        ef_construction=settings.vector_index_hnsw_ef_construction,
+        replace=True,
+    )
+    return f"vector {index_type}"
+
+
+def build_scalar_indexes(table: LanceTable, columns: dict[str, str], rebuild: bool = False) -> list[str]:
+    indexed = _indexed_columns(table)
+    built = []
+    for column, index_type in columns.items():
+        if column not in table.schema.names or (not rebuild and column in indexed):
+            continue
+        table.create_scalar_index(column, index_type=index_type, replace=True)
+        built.append(f"{column} {index_type}")
+    return built
+
+
+def optimize_table(table: LanceTable, rebuild: bool = False, compact: bool = True) -> MaintenanceReport:
+    """
+    Build missing indexes, then compact small fragments left behind by repeated
+    adds and upserts, fold new rows into the existing indexes and delete table
+    versions older than optimize_cleanup_older_than_days.
+    """
+    started = time.perf_counter()
+    fragments_before = table.stats()["fragment_stats"]["num_fragments"]
+    vector_index = build_vector_index(table, rebuild)
+    scalar_indexes = build_scalar_indexes(table, SCALAR_INDEXES.get(table.name, {}), rebuild)
+    if compact:
+        table.optimize(cleanup_older_than=timedelta(days=settings.optimize_cleanup_older_than_days))
+    stats = table.stats()
+    return MaintenanceReport(
+        table=table.name,
+        rows=stats["num_rows"],
+        fragments_before=fragments_before,
+        fragments_after=stats["fragment_stats"]["num_fragments"],
+        vector_index=vector_index,
+        scalar_indexes=scalar_indexes,
+        seconds=time.perf_counter() - started,
+    )
+
+
+def optimize_all(db: DBConnection, rebuild: bool = False, compact: bool = True) -> list[MaintenanceReport]:
+    return [
+        optimize_table(db.open_table(name), rebuild=rebuild, compact=compact)
+        for name in SCALAR_INDEXES
+        if name in db.table_names()
+    ]
+
+
+def optimize_on_startup(db: DBConnection, lock_path: str | Path) -> list[MaintenanceReport]:
+    """
+    Build missing indexes from one worker only. Every worker of a deployment
+    starts at once; the one that takes the lock builds, the others skip instead
+    of racing to create the same indexes. Existing indexes are left alone, and
+    compaction stays with `manage optimize`.
+    """
+    lock_path = Path(lock_path)
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with lock_path.open("w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            print("another worker is building indexes, skipping")
+            return []
+        try:
+            return optimize_all(db, rebuild=False, compact=False)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
@@ -54,6 +54,11 @@ class UHCourses(RootModel[List[UHCourse]]):
 class UHCoursePlan(UHCourse):
     candidates: list[UHCourse] = []
 
+    @classmethod
+    def from_candidates(cls, candidates: list[UHCourse]) -> "UHCoursePlan":
+        """The best candidate carrying the whole list. Search results are trusted, no re-validation."""
+        return cls.model_construct(**dict(candidates[0]), candidates=candidates)
+
 # -----------------------------
 # Mānoa degree pathways
 # -----------------------------
@@ -94,6 +99,24 @@ class DegreePathwayBase(BaseModel, Generic[CourseT]):
 
 DegreePathway = DegreePathwayBase[PathwayCourse]
 
+class DegreePathwaySummary(BaseModel):
+    """Listing fields of a pathway, served from columns without parsing the full document."""
+    pathway_id: str
+    program_name: str
+    institution: str
+    total_credits: int
+    course_count: int
+
+    @classmethod
+    def from_pathway(cls, pathway: "DegreePathway") -> "DegreePathwaySummary":
+        return cls(
+            pathway_id=pathway.pathway_id,
+            program_name=pathway.program_name,
+            institution=pathway.institution,
+            total_credits=pathway.total_credits,
+            course_count=sum(len(s.courses) for y in pathway.years for s in y.semesters),
+        )
+
 class DegreePathwayCandidate(BaseModel):
     name: str
     pathway_id: str
@@ -103,9 +126,75 @@ class CompleteDegreePathway(DegreePathwayBase[UHCoursePlan]):
     summary: str
     candidates: list[DegreePathwayCandidate]
 
+    @classmethod
+    def assemble(
+            cls,
+            pathway: DegreePathway,
+            courses: list[UHCoursePlan],
+            candidates: list[DegreePathwayCandidate],
+            summary: str = "",
+    ) -> "CompleteDegreePathway":
+        """
+        Place completed courses, one per requirement in flatten_pathway_courses
+        order, into the pathway's years and semesters. Every part is already a
+        validated model, so the tree is built with model_construct instead of
+        being dumped to dicts and validated again.
+        """
+        slots = iter(courses)
+        years = [
+            YearPlan[UHCoursePlan].model_construct(
+                year_number=year.year_number,
+                semesters=[
+                    SemesterPlan[UHCoursePlan].model_construct(
+                        semester_name=semester.semester_name,
+                        credits=semester.credits,
+                        courses=[next(slots) for _ in semester.courses],
+                    )
+                    for semester in year.semesters
+                ],
+            )
+            for year in pathway.years
+        ]
+        return cls.model_construct(
+            pathway_id=pathway.pathway_id,
+            program_name=pathway.program_name,
+            institution=pathway.institution,
+            total_credits=pathway.total_credits,
+            years=years,
+            summary=summary,
+            candidates=candidates,
+        )
+
+class PlanSummaryRequest(BaseModel):
+    plan: CompleteDegreePathway
+    query: str
+
+class PlanSummary(BaseModel):
+    summary: str
+
+class PlanExportRequest(BaseModel):
+    """Plans to export together. pathway_ids are completed against query first, without summaries."""
+    plans: list[CompleteDegreePathway] = []
+    pathway_ids: list[str] = []
+    query: str = ""
+    cross_campus: bool = False
+    format: Literal["zip", "pdf"] = "zip"
+
+    @model_validator(mode="after")
+    def _check_sources(self):
+        if not self.plans and not self.pathway_ids:
+            raise ValueError("nothing to export: give plans or pathway_ids")
+        if self.pathway_ids and not self.query.strip():
+            raise ValueError("query is required to complete pathway_ids")
+        return self
+
 class DegreePathways(RootModel[List[DegreePathway]]):
     pass
 
+def flatten_pathway_courses(pathway: DegreePathway) -> list[PathwayCourse]:
+    """Every course requirement of a pathway in year/semester order."""
+    return [c for y in pathway.years for s in y.semesters for c in s.courses]
+
 class CourseQueryBase(BaseModel):
     subject_code: str | None = None
     course_number: int | None = None
@@ -115,6 +204,11 @@ class CourseQueryBase(BaseModel):
 
 class CourseQuery(CourseQueryBase):
     query: str | None = None
+    vector: list[float] | None = None
+    # Restrict the search to these courses (a precomputed candidate set).
+    course_ids: list[str] | None = None
+    # Only courses of this campus, None searches every campus.
+    inst_ipeds: int | None = None
     credits: int | None = None
     k: int | None = None
     n: int | None = None
@@ -1,9 +1,12 @@
 from datetime import datetime
 from io import BytesIO
+from pathlib import Path
 import unicodedata
 from textwrap import fill
 
 from fpdf import FPDF
+from pypdf import PdfReader, PdfWriter
+from pypdf.annotations import Link
 
 from backend.api.models import CompleteDegreePathway, UHCourse, UHCoursePlan
 
@@ -191,3 +194,71 @@ def build_pathway_pdf(plan: CompleteDegreePathway) -> bytes:
     output = BytesIO()
     pdf.output(output)
     return output.getvalue()
+
+
+def _build_contents(titles: list[str], first_pages: list[int]) -> tuple[bytes, list[tuple[int, tuple, int]]]:
+    """
+    Table of contents for a merged export, and a (contents page, rect in PDF
+    points, target page) link for every entry. first_pages count from the first
+    page after the contents.
+    """
+    contents_pages = 1
+    while True:
+        pdf = PathwayPDF()
+        pdf.set_auto_page_break(auto=True, margin=15)
+        pdf.add_page()
+        pdf.set_font("Helvetica", "B", 14)
+        pdf.set_text_color(*TEXT_PRIMARY)
+        pdf.cell(0, 8, "Contents", ln=True)
+        pdf.ln(2)
+
+        pdf.set_font("Helvetica", "", 11)
+        pdf.set_text_color(*ACCENT_BLUE)
+        links = []
+        for title, first_page in zip(titles, first_pages):
+            target = contents_pages + first_page
+            # Break before the entry so its page and y are where it is drawn.
+            if pdf.will_page_break(7):
+                pdf.add_page()
+            y = pdf.get_y()
+            width = pdf.w - pdf.l_margin - pdf.r_margin
+            pdf.cell(width - 20, 7, _sanitize_text(title)[:90])
+            pdf.cell(20, 7, str(target + 1), align="R", ln=True)
+            rect = (
+                pdf.l_margin * pdf.k,
+                (pdf.h - y - 7) * pdf.k,
+                (pdf.w - pdf.r_margin) * pdf.k,
+                (pdf.h - y) * pdf.k,
+            )
+            links.append((pdf.page_no() - 1, rect, target))
+
+        if pdf.page_no() == contents_pages:
+            output = BytesIO()
+            pdf.output(output)
+            return output.getvalue(), links
+        contents_pages = pdf.page_no()
+
+
+def merge_pathway_pdfs(parts: list[tuple[str, Path]], output: Path) -> None:
+    """
+    Concatenate exported plans from files into one PDF at output, behind a
+    linked table of contents and with an outline entry per plan. Page counts
+    come from a first pass that opens one file at a time; appending then reads
+    each file once and drops it, but the writer holds the merged document until
+    it is written, so memory grows with the total size of the parts.
+    """
+    first_pages = []
+    page = 0
+    for _, path in parts:
+        first_pages.append(page)
+        page += len(PdfReader(path).pages)
+
+    contents, links = _build_contents([title for title, _ in parts], first_pages)
+    writer = PdfWriter()
+    writer.append(BytesIO(contents))
+    for title, path in parts:
+        writer.append(path, outline_item=_sanitize_text(title))
+    for contents_page, rect, target in links:
+        writer.add_annotation(contents_page, Link(rect=rect, target_page_index=target))
+    with output.open("wb") as file:
+        writer.write(file)
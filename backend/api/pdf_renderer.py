@@ -0,0 +1,226 @@
+import asyncio
+import hashlib
+import multiprocessing
+import time
+import weakref
+from collections import OrderedDict, deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import AsyncIterable, AsyncIterator, Callable, Optional
+
+from backend.api.models import CompleteDegreePathway
+from backend.api.pdf import build_pathway_pdf
+from backend.api.settings import settings
+
+
+class RendererBusy(RuntimeError):
+    """Raised instead of queueing once max_pending renders are waiting."""
+
+
+def payload_hash(payload: str) -> str:
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def render_payload(payload: str) -> bytes:
+    """Worker entry point. Plans cross the process boundary as JSON, which is also what is hashed."""
+    return build_pathway_pdf(CompleteDegreePathway.model_validate_json(payload))
+
+
+class PdfRenderer:
+    """
+    Renders export PDFs off the event loop. FPDF layout is CPU-bound, so with
+    workers > 0 it runs in a process pool; workers = 0 falls back to a thread,
+    which still frees the loop but shares the GIL with request handling.
+
+    At most max_pending renders are admitted at once, more raise RendererBusy
+    so a burst of exports is turned away instead of piling up. Finished PDFs
+    are kept by payload hash in an LRU bounded by total bytes, and identical
+    renders in flight are coalesced. Cached PDFs expire after cache_ttl seconds
+    because the footer carries the time they were generated.
+    """
+
+    def __init__(self, workers: int, max_pending: int, cache_max_bytes: int, cache_ttl: float = 600.0):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.cache_max_bytes = cache_max_bytes
+        self.cache_ttl = cache_ttl
+        self._executor: Optional[Executor] = None
+        self._cache: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self._cache_bytes = 0
+        self._inflight: dict[str, asyncio.Future] = {}
+        # Slots taken by single renders in flight and by the windows of running batches.
+        self._admitted = 0
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+        self.restarts = 0
+
+    @property
+    def pending(self) -> int:
+        return self._admitted
+
+    def _admit(self, slots: int) -> Callable[[], None]:
+        """Take slots or raise RendererBusy. Returns the release, which is safe to call twice."""
+        if self._admitted + slots > self.max_pending:
+            self.rejected += 1
+            raise RendererBusy(f"{self._admitted} PDF exports already pending")
+        self._admitted += slots
+        released = False
+
+        def release() -> None:
+            nonlocal released
+            if not released:
+                released = True
+                self._admitted -= slots
+
+        return release
+
+    def _get_executor(self) -> Optional[Executor]:
+        if self.workers > 0 and self._executor is None:
+            # spawn, not fork: the server process holds threads and open Lance handles.
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    def _discard_executor(self, executor: Executor) -> None:
+        # Concurrent renders may all see the same broken pool, only the first replaces it.
+        if self._executor is executor:
+            print("PDF worker pool broke, starting a new one")
+            self.restarts += 1
+            self._executor = None
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _cached(self, key: str) -> Optional[bytes]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        expires, pdf = entry
+        if expires <= time.monotonic():
+            del self._cache[key]
+            self._cache_bytes -= len(pdf)
+            return None
+        self._cache.move_to_end(key)
+        return pdf
+
+    def _remember(self, key: str, pdf: bytes) -> None:
+        if len(pdf) > self.cache_max_bytes:
+            return
+        previous = self._cache.pop(key, None)
+        if previous is not None:
+            self._cache_bytes -= len(previous[1])
+        self._cache[key] = (time.monotonic() + self.cache_ttl, pdf)
+        self._cache_bytes += len(pdf)
+        while self._cache_bytes > self.cache_max_bytes:
+            _, (_, evicted) = self._cache.popitem(last=False)
+            self._cache_bytes -= len(evicted)
+
+    async def render(self, plan: CompleteDegreePathway) -> bytes:
+        return await self.render_json(plan.model_dump_json(by_alias=True))
+
+    async def render_json(self, payload: str, bounded: bool = True) -> bytes:
+        key = payload_hash(payload)
+        pdf = self._cached(key)
+        if pdf is not None:
+            self.hits += 1
+            return pdf
+
+        future = self._inflight.get(key)
+        if future is None:
+            release = self._admit(1) if bounded else None
+            self.misses += 1
+            future = asyncio.ensure_future(self._render(key, payload))
+            self._inflight[key] = future
+            if release is not None:
+                future.add_done_callback(lambda _: release())
+        return await asyncio.shield(future)
+
+    def render_many(self, plans: AsyncIterable[CompleteDegreePathway]) -> AsyncIterator[tuple[CompleteDegreePathway, bytes]]:
+        """
+        Each plan with its PDF, in order. Plans are pulled as they arrive and
+        rendered in parallel, but at most one more than there are workers ahead
+        of the consumer, so a large batch never holds more than that many PDFs.
+        The whole window is reserved up front, so RendererBusy is raised here
+        rather than halfway through the batch, and held until the iterator
+        finishes or is dropped unstarted.
+        """
+        window = max(self.workers, 1) + 1
+        release = self._admit(window)
+        batch = self._render_ordered(plans, window, release)
+        weakref.finalize(batch, release)
+        return batch
+
+    async def _render_ordered(
+            self,
+            plans: AsyncIterable[CompleteDegreePathway],
+            window: int,
+            release: Callable[[], None],
+    ) -> AsyncIterator[tuple[CompleteDegreePathway, bytes]]:
+        ahead: deque[tuple[CompleteDegreePathway, asyncio.Future]] = deque()
+        remaining = aiter(plans)
+
+        async def fill() -> None:
+            while len(ahead) < window:
+                plan = await anext(remaining, None)
+                if plan is None:
+                    return
+                payload = plan.model_dump_json(by_alias=True)
+                ahead.append((plan, asyncio.ensure_future(self.render_json(payload, bounded=False))))
+
+        try:
+            await fill()
+            while ahead:
+                plan, task = ahead.popleft()
+                pdf = await task
+                yield plan, pdf
+                await fill()
+        finally:
+            # Renders already started finish in the pool and land in the cache.
+            for _, task in ahead:
+                task.cancel()
+            release()
+
+    async def _run(self, payload: str) -> bytes:
+        executor = self._get_executor()
+        if executor is None:
+            return await asyncio.to_thread(render_payload, payload)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, render_payload, payload)
+        except BrokenProcessPool:
+            # A worker died (OOM, a crash in a native library). Replace the pool and retry once.
+            self._discard_executor(executor)
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), render_payload, payload)
+
+    async def _render(self, key: str, payload: str) -> bytes:
+        try:
+            pdf = await self._run(payload)
+            self._remember(key, pdf)
+            return pdf
+        finally:
+            self._inflight.pop(key, None)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "entries": len(self._cache),
+            "bytes": self._cache_bytes,
+            "pending": self.pending,
+            "hits": self.hits,
+            "misses": self.misses,
+            "rejected": self.rejected,
+            "restarts": self.restarts,
+        }
+
+
+def get_pdf_renderer() -> PdfRenderer:
+    return PdfRenderer(
+        workers=settings.pdf_export_workers,
+        max_pending=settings.pdf_export_max_pending,
+        cache_max_bytes=settings.pdf_export_cache_max_bytes,
+        cache_ttl=settings.pdf_export_cache_ttl_seconds,
+    )
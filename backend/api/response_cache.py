@@ -0,0 +1,198 @@
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Awaitable, Callable, Optional, Protocol
+
+from backend.api.settings import settings
+
+
+def normalize_query(query: str) -> str:
+    """Case and whitespace insensitive form of a query, so trivially different prompts share an entry."""
+    return " ".join(unicodedata.normalize("NFKC", query).casefold().split())
+
+
+def response_key(
+        query: str,
+        files_hash: str = "",
+        pathway_id: Optional[str] = None,
+        cross_campus: bool = False,
+        summary_deadline: Optional[float] = None,
+) -> str:
+    """
+    The summary deadline is part of the key: a request with one must not join a
+    computation that waits for the whole summary, nor one without get a plan
+    that was cut short.
+    """
+    deadline = "" if summary_deadline is None else repr(float(summary_deadline))
+    parts = [normalize_query(query), files_hash, pathway_id or "", "cross" if cross_campus else "", deadline]
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+class ResponseStore(Protocol):
+    def get(self, key: str) -> Optional[str]: ...
+
+    def set(self, key: str, value: str) -> None: ...
+
+    def __len__(self) -> int: ...
+
+
+class MemoryResponseStore:
+    """LRU of serialized responses in this process, entries expire after ttl seconds."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        self._entries[key] = (time.time() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SqliteResponseStore:
+    """
+    The same LRU+TTL policy in a SQLite file, shared by every worker on the host
+    and kept across restarts.
+    """
+
+    def __init__(self, path: str | Path, max_entries: int, ttl: float):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL, used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_used ON responses (used)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE responses SET used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, expires, used) VALUES (?, ?, ?, ?)",
+                (key, value, now + self.ttl, now),
+            )
+            self._conn.execute("DELETE FROM responses WHERE expires <= ?", (now,))
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+class ResponseCache:
+    """
+    Serialized /predict responses by request key, plus single-flight coalescing:
+    concurrent requests for the same key await one computation instead of each
+    running the pathway search, course searches and summary again.
+    """
+
+    def __init__(self, store: Optional[ResponseStore]):
+        self.store = store
+        self._inflight: dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    async def get_or_compute(
+            self,
+            key: str,
+            compute: Callable[[], Awaitable[tuple[str, bool]]],
+    ) -> str:
+        """
+        The cached response for key, or the one compute returns. compute also says
+        whether its result may be stored (plans missing their summary are not, so
+        the next request picks up the summary that finished in the background).
+        """
+        if self.store is not None:
+            value = await asyncio.to_thread(self.store.get, key)
+            if value is not None:
+                self.hits += 1
+                return value
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.create_task(self._compute(key, compute))
+            self._inflight[key] = task
+        return await asyncio.shield(task)
+
+    async def _compute(self, key: str, compute: Callable[[], Awaitable[tuple[str, bool]]]) -> str:
+        try:
+            value, cacheable = await compute()
+            if cacheable and self.store is not None:
+                await asyncio.to_thread(self.store.set, key, value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "entries": len(self.store) if self.store is not None else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+        }
+
+
+def get_response_cache() -> ResponseCache:
+    backend = settings.response_cache_backend
+    if backend == "memory":
+        store = MemoryResponseStore(settings.response_cache_max_entries, settings.response_cache_ttl_seconds)
+    elif backend == "sqlite":
+        store = SqliteResponseStore(
+            settings.response_cache_path,
+            settings.response_cache_max_entries,
+            settings.response_cache_ttl_seconds,
+        )
+    else:
+        store = None
+    return ResponseCache(store)
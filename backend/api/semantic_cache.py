@@ -0,0 +1,96 @@
+import time
+from typing import Optional
+
+import numpy as np
+
+from backend.api.models import CompleteDegreePathway
+from backend.api.settings import settings
+
+
+class SemanticPlanCache:
+    """
+    Completed plans by query embedding. A query whose vector is within
+    threshold cosine similarity of a stored one (same scope) gets that plan
+    back, so paraphrases like "I like computers" / "I'm into computers" skip
+    course matching and the summary. Vectors live in one preallocated matrix;
+    the least recently used entry is evicted when it is full.
+    """
+
+    def __init__(self, threshold: float, max_entries: int = 1024, ttl: Optional[float] = None):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._vectors: Optional[np.ndarray] = None
+        self._valid = np.zeros(max_entries, dtype=bool)
+        self._expires = np.full(max_entries, np.inf)
+        self._used = np.zeros(max_entries)
+        self._scopes: list[Optional[str]] = [None] * max_entries
+        self._plans: list[Optional[CompleteDegreePathway]] = [None] * max_entries
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _normalize(vector: list[float]) -> np.ndarray:
+        v = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(v)
+        return v / norm if norm else v
+
+    def _similarities(self, v: np.ndarray, scope: str) -> np.ndarray:
+        if self._vectors is None:
+            return np.full(self.max_entries, -np.inf)
+        live = self._valid & (self._expires > time.monotonic())
+        live &= np.array([s == scope for s in self._scopes])
+        return np.where(live, self._vectors @ v, -np.inf)
+
+    def lookup(self, vector: list[float], scope: str = "") -> Optional[CompleteDegreePathway]:
+        similarities = self._similarities(self._normalize(vector), scope)
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._used[best] = time.monotonic()
+        return self._plans[best].model_copy()
+
+    def store(self, vector: list[float], plan: CompleteDegreePathway, scope: str = "") -> None:
+        v = self._normalize(vector)
+        if self._vectors is None:
+            self._vectors = np.zeros((self.max_entries, len(v)), dtype=np.float32)
+
+        similarities = self._similarities(v, scope)
+        best = int(np.argmax(similarities))
+        if similarities[best] >= self.threshold:
+            # Refresh the entry this query would have hit instead of adding a near-copy.
+            slot = best
+        elif not self._valid.all():
+            slot = int(np.argmin(self._valid))
+        else:
+            expired = self._expires <= time.monotonic()
+            slot = int(np.argmax(expired)) if expired.any() else int(np.argmin(self._used))
+
+        now = time.monotonic()
+        self._vectors[slot] = v
+        self._valid[slot] = True
+        self._expires[slot] = now + self.ttl if self.ttl is not None else np.inf
+        self._used[slot] = now
+        self._scopes[slot] = scope
+        self._plans[slot] = plan.model_copy()
+
+    def stats(self) -> dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": int(self._valid.sum()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def get_semantic_cache() -> Optional[SemanticPlanCache]:
+    if not settings.semantic_cache_enabled:
+        return None
+    return SemanticPlanCache(
+        settings.semantic_cache_threshold,
+        max_entries=settings.semantic_cache_max_entries,
+        ttl=settings.semantic_cache_ttl_seconds,
+    )
@@ -0,0 +1,108 @@
+import asyncio
+from typing import Optional
+
+from fastapi import Request
+
+from backend.api.application import DegreePathwayPredictor
+from backend.api.db import (
+    CourseVectorDb,
+    PathwayVectorDb,
+    get_candidate_store,
+    get_course_db,
+    get_pathway_db,
+    get_query_embedder,
+)
+from backend.api.embeddings import get_embedding_cache
+from backend.api.llm import get_query_builder
+from backend.api.maintenance import optimize_on_startup
+from backend.api.pdf_renderer import PdfRenderer, get_pdf_renderer
+from backend.api.response_cache import ResponseCache, get_response_cache
+from backend.api.semantic_cache import get_semantic_cache
+from backend.api.settings import settings
+from backend.api.summary import get_summary_service
+
+
+class Services:
+    """
+    Long-lived objects shared by every request in a worker. Built once in the
+    application lifespan instead of once per request through Depends factories.
+    """
+
+    def __init__(self):
+        self.course_db: CourseVectorDb = get_course_db()
+        self.pathway_db: PathwayVectorDb = get_pathway_db()
+        self.query_builder = get_query_builder()
+        self.embedder = get_query_embedder()
+        self.candidate_store = get_candidate_store()
+        self.summary_service = get_summary_service()
+        self.response_cache = get_response_cache()
+        self.semantic_cache = get_semantic_cache()
+        self.pdf_renderer = get_pdf_renderer()
+        self.predictor = DegreePathwayPredictor(
+            course_db=self.course_db,
+            pathway_db=self.pathway_db,
+            query_builder=self.query_builder,
+            embedder=self.embedder,
+            candidate_store=self.candidate_store,
+            summary_service=self.summary_service,
+            semantic_cache=self.semantic_cache,
+        )
+        self.ready = False
+        self.error: Optional[str] = None
+
+    async def warm_up(self) -> None:
+        """Open connections and tables ahead of the first request."""
+        try:
+            if settings.optimize_on_startup:
+                reports = await asyncio.to_thread(optimize_on_startup, self.course_db.db, settings.optimize_lock_path)
+                for report in reports:
+                    print(report)
+            await asyncio.gather(
+                self.course_db.warm_up(),
+                self.pathway_db.warm_up(),
+                self.candidate_store.load(),
+            )
+        except Exception as exc:
+            self.error = repr(exc)
+            print(f"warm-up failed: {exc!r}")
+            return
+        self.ready = True
+        print("services ready")
+
+    def status(self) -> dict:
+        return {
+            "ready": self.ready,
+            "error": self.error,
+            "embedding_cache": get_embedding_cache().stats(),
+            "summary": self.summary_service.stats(),
+            "query_builder": self.query_builder.stats(),
+            "response_cache": self.response_cache.stats(),
+            "semantic_cache": self.semantic_cache.stats() if self.semantic_cache else None,
+            "pdf_export": self.pdf_renderer.stats(),
+        }
+
+
+async def start_services() -> tuple[Services, asyncio.Task]:
+    # Construction reads queries.json and lists tables, keep it off the event loop.
+    services = await asyncio.to_thread(Services)
+    return services, asyncio.create_task(services.warm_up())
+
+
+def get_services(request: Request) -> Services:
+    return request.app.state.services
+
+
+def get_predictor(request: Request) -> DegreePathwayPredictor:
+    return get_services(request).predictor
+
+
+def get_responses(request: Request) -> ResponseCache:
+    return get_services(request).response_cache
+
+
+def get_renderer(request: Request) -> PdfRenderer:
+    return get_services(request).pdf_renderer
+
+
+def get_pathways(request: Request) -> PathwayVectorDb:
+    return get_services(request).pathway_db
@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pathlib import Path
+from typing import Literal
 
 parent_folder = Path(__file__).parent.parent
 
@@ -7,7 +8,80 @@ class Settings(BaseSettings):
     model_config = SettingsConfigDict(env_file=parent_folder / ".env")
     openai_api_key: str
     openai_llm: str
+    # Point both the LLM and embedding clients at an OpenAI-compatible server (e.g. a local fake).
+    openai_base_url: str | None = None
     lancedb_storage_path: str
+    # How often open tables check storage for writes from other processes (None: never).
+    lance_read_consistency_seconds: float | None = 10.0
     course_query_cache_path: Path = parent_folder / "data/queries.json"
+    # Unknown requirement names this similar to a known one reuse its query instead of asking the LLM.
+    query_builder_fuzzy_threshold: float = 0.9
+    embedding_cache_path: Path = parent_folder / "data/embedding_cache.sqlite"
+    embedding_cache_memory_items: int = 10_000
+    # Bulk ingestion: concurrent embedding batches, kept under the account's rate limits.
+    embedding_batch_size: int = 256
+    embedding_concurrency: int = 4
+    embedding_requests_per_minute: int = 3000
+    embedding_tokens_per_minute: int = 1_000_000
+    embedding_max_retries: int = 6
+    # IPEDS id of every campus whose courses are loaded, keyed by institution name as written in
+    # the pathways (matched case, accent and punctuation insensitively). Pathways from institutions
+    # missing here search the whole catalog.
+    institution_ipeds: dict[str, int] = {
+        "University of Hawaiʻi at Mānoa": 141574,
+    }
+    # "numpy" keeps the course catalog in RAM and answers a whole pathway with one matrix product.
+    course_retrieval_backend: Literal["lance", "numpy"] = "lance"
+    # Lance course searches in flight at once per process (the NumPy backend is not limited).
+    course_search_concurrency: int = 8
+    # Requirements matching more courses than this (e.g. "Elective") keep using the filtered search.
+    candidate_set_max_size: int = 2000
+    # Vectors of candidate sets kept by the Lance backend for ranking them directly.
+    candidate_vector_cache_max_bytes: int = 256 * 1024 * 1024
+    # Opt-in: /predict returns the plan without a summary once this many seconds have passed.
+    # Only for clients that fetch it later from POST /summary, the bundled frontend waits.
+    summary_deadline_seconds: float | None = None
+    summary_timeout_seconds: float | None = 60.0
+    # Opt-in "hybrid" fuses vector and BM25 keyword rankings with reciprocal rank fusion.
+    pathway_search_mode: Literal["vector", "hybrid"] = "vector"
+    hybrid_search_depth: int = 20
+    rrf_k: int = 60
+    pathway_cache_size: int = 512
+    # ANN index built by `manage optimize`; tables smaller than vector_index_min_rows keep the flat scan.
+    vector_index_type: Literal["IVF_PQ", "IVF_HNSW_SQ", "none"] = "IVF_PQ"
+    vector_index_min_rows: int = 5000
+    vector_index_partitions: int | None = None
+    vector_index_sub_vectors: int | None = None
+    vector_index_hnsw_m: int = 20
+    vector_index_hnsw_ef_construction: int = 300
+    vector_search_nprobes: int = 20
+    vector_search_refine_factor: int | None = 10
+    optimize_cleanup_older_than_days: float = 7.0
+    # Build missing indexes during warm-up instead of waiting for `manage optimize`.
+    optimize_on_startup: bool = False
+    # Held by the one worker building indexes on startup (a host-local file).
+    optimize_lock_path: Path = parent_folder / "data/optimize.lock"
+    # Finished /predict responses by normalized query, uploaded files and pathway_id.
+    response_cache_backend: Literal["memory", "sqlite", "none"] = "memory"
+    response_cache_path: Path = parent_folder / "data/response_cache.sqlite"
+    response_cache_max_entries: int = 512
+    response_cache_ttl_seconds: float = 3600.0
+    # Opt-in: serve the plan of an earlier query whose embedding is at least this cosine-similar.
+    semantic_cache_enabled: bool = False
+    semantic_cache_threshold: float = 0.95
+    semantic_cache_max_entries: int = 1024
+    semantic_cache_ttl_seconds: float | None = 3600.0
+    # /export renders in this many worker processes (0 renders in a thread instead).
+    pdf_export_workers: int = 2
+    # Exports running or queued beyond this answer 503 instead of waiting.
+    pdf_export_max_pending: int = 16
+    pdf_export_cache_max_bytes: int = 64 * 1024 * 1024
+    # Cached PDFs carry their render time in the footer, so they are not reused for long.
+    pdf_export_cache_ttl_seconds: float = 600.0
+    pdf_export_batch_max_plans: int = 100
+    # Plans built at once for the pathway ids of a batch export.
+    pdf_export_batch_plan_concurrency: int = 4
+    summary_prompt_token_budget: int = 1500
+    summary_course_desc_chars: int = 160
 
 settings = Settings()
@@ -0,0 +1,217 @@
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import AsyncIterator, Optional
+
+from pydantic import BaseModel
+from pydantic_ai import Agent
+
+from backend.api.llm import agent
+from backend.api.models import CompleteDegreePathway, UHCourse
+from backend.api.settings import settings
+from backend.api.tokens import CHARS_PER_TOKEN, estimate_tokens
+
+
+SUMMARY_INSTRUCTIONS = (
+    "explain in 8 sentences how these courses resonate well with this query. "
+    "Your tone should be like you are speaking to the person who wrote the query "
+    "(you speak as if you are the college counselor). do not use em dashes. "
+    "Do not start with a greeting. Just go to the summary straight away."
+)
+
+
+def _truncate(text: str, max_chars: int) -> str:
+    text = " ".join(text.split())
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars].rsplit(" ", 1)[0]
+    return f"{cut}..."
+
+
+def course_line(course: UHCourse, desc_chars: int) -> str:
+    code = f"{course.subject_code} {course.course_number}{course.course_suffix or ''}"
+    units = course.num_units
+    credits = f"{units.min:g}" if units.min == units.max else f"{units.min:g}-{units.max:g}"
+    line = f"- {code}: {_truncate(course.course_title, 120)} ({credits} cr)"
+    if desc_chars > 0 and course.course_desc:
+        line = f"{line} - {_truncate(course.course_desc, desc_chars)}"
+    return line
+
+
+class SummaryPrompt(BaseModel):
+    text: str
+    estimated_tokens: int
+    courses_included: int
+    courses_total: int
+
+
+def build_summary_prompt(
+        plan: CompleteDegreePathway,
+        query: str,
+        token_budget: int = 1500,
+        desc_chars: int = 160,
+) -> SummaryPrompt:
+    """
+    One compact line per chosen course (code, title, credits, short description)
+    instead of the full course JSON, stopping once the token budget is spent. The
+    query can carry a whole uploaded resume, so it gets at most half the budget.
+    """
+    # Placeholders for unmatched requirements have no candidates and are left out.
+    courses = [
+        course
+        for year in plan.years
+        for semester in year.semesters
+        for course in semester.courses
+        if course.candidates
+    ]
+
+    query_text = _truncate(query, max(token_budget // 2, 1) * CHARS_PER_TOKEN)
+    head = f"PROGRAM: {plan.program_name} ({plan.institution})\nCOURSES:\n"
+    tail = f"\n\n{SUMMARY_INSTRUCTIONS}\nQUERY: '{query_text}'"
+    remaining = token_budget - estimate_tokens(head) - estimate_tokens(tail)
+
+    lines: list[str] = []
+    for course in courses:
+        line = course_line(course, desc_chars)
+        cost = estimate_tokens(line) + 1
+        if cost > remaining:
+            # Out of budget: keep going with bare code/title lines while they fit.
+            line = course_line(course, 0)
+            cost = estimate_tokens(line) + 1
+            if cost > remaining:
+                break
+        lines.append(line)
+        remaining -= cost
+
+    text = head + "\n".join(lines) + tail
+    return SummaryPrompt(
+        text=text,
+        estimated_tokens=estimate_tokens(text),
+        courses_included=len(lines),
+        courses_total=len(courses),
+    )
+
+
+def summary_prompt(plan: CompleteDegreePathway, query: str) -> SummaryPrompt:
+    return build_summary_prompt(
+        plan,
+        query,
+        token_budget=settings.summary_prompt_token_budget,
+        desc_chars=settings.summary_course_desc_chars,
+    )
+
+
+class SummaryService:
+    """
+    Generates the LLM summary for a completed plan, off the critical path of /predict.
+    Summaries are cached by a hash of the plan plus the query, and a generation that
+    misses a request's deadline keeps running so a later /summary call is instant.
+    """
+
+    def __init__(self, summary_agent: Agent, max_entries: int = 1024, timeout: float | None = None):
+        self.agent = summary_agent
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._cache: OrderedDict[str, str] = OrderedDict()
+        self._inflight: dict[str, asyncio.Task] = {}
+        self.prompts_built = 0
+        self.prompt_tokens = 0
+        self.last_prompt_tokens = 0
+
+    @staticmethod
+    def key(plan: CompleteDegreePathway, query: str) -> str:
+        payload = plan.model_dump_json(exclude={"summary"})
+        return hashlib.sha256(f"{payload}\0{query}".encode("utf-8")).hexdigest()
+
+    def cached(self, plan: CompleteDegreePathway, query: str) -> Optional[str]:
+        key = self.key(plan, query)
+        summary = self._cache.get(key)
+        if summary is not None:
+            self._cache.move_to_end(key)
+        return summary
+
+    def _prompt(self, plan: CompleteDegreePathway, query: str) -> str:
+        prompt = summary_prompt(plan, query)
+        self.prompts_built += 1
+        self.prompt_tokens += prompt.estimated_tokens
+        self.last_prompt_tokens = prompt.estimated_tokens
+        print(
+            f"summary prompt: ~{prompt.estimated_tokens} tokens, "
+            f"{prompt.courses_included}/{prompt.courses_total} courses"
+        )
+        return prompt.text
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "cached": len(self._cache),
+            "prompts_built": self.prompts_built,
+            "prompt_tokens": self.prompt_tokens,
+            "last_prompt_tokens": self.last_prompt_tokens,
+        }
+
+    def _store(self, key: str, summary: str) -> None:
+        self._cache[key] = summary
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    async def _generate(self, key: str, prompt: str) -> str:
+        try:
+            result = await asyncio.wait_for(self.agent.run(prompt), self.timeout)
+            summary = str(result.output)
+            self._store(key, summary)
+            return summary
+        finally:
+            self._inflight.pop(key, None)
+
+    def _task(self, plan: CompleteDegreePathway, query: str) -> asyncio.Task:
+        key = self.key(plan, query)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._generate(key, self._prompt(plan, query)))
+            self._inflight[key] = task
+        return task
+
+    async def summarize(self, plan: CompleteDegreePathway, query: str) -> str:
+        summary = self.cached(plan, query)
+        if summary is not None:
+            return summary
+        return await asyncio.shield(self._task(plan, query))
+
+    async def summarize_within(
+            self,
+            plan: CompleteDegreePathway,
+            query: str,
+            deadline: Optional[float],
+    ) -> Optional[str]:
+        """The summary, or None if it is not ready within deadline seconds or the LLM fails."""
+        summary = self.cached(plan, query)
+        if summary is not None:
+            return summary
+        if deadline is not None and deadline <= 0:
+            return None
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(self._task(plan, query)), deadline)
+        except TimeoutError:
+            print(f"summary missed the {deadline}s deadline, returning the plan without it")
+        except Exception as exc:
+            print(f"summary failed: {exc!r}")
+        return None
+
+    async def stream(self, plan: CompleteDegreePathway, query: str) -> AsyncIterator[str]:
+        summary = self.cached(plan, query)
+        if summary is not None:
+            yield summary
+            return
+
+        parts: list[str] = []
+        async with self.agent.run_stream(self._prompt(plan, query)) as result:
+            async for delta in result.stream_text(delta=True):
+                parts.append(delta)
+                yield delta
+        self._store(self.key(plan, query), "".join(parts))
+
+
+def get_summary_service() -> SummaryService:
+    return SummaryService(agent, timeout=settings.summary_timeout_seconds)
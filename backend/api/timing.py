@@ -0,0 +1,29 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Iterator, Optional
+
+# Per-request stage timings in milliseconds. Tasks spawned while handling a request
+# inherit the same dict, so concurrent stages all land in one place.
+_timings: ContextVar[Optional[dict[str, float]]] = ContextVar("timings", default=None)
+
+
+def start_timings() -> dict[str, float]:
+    timings: dict[str, float] = {}
+    _timings.set(timings)
+    return timings
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        timings = _timings.get()
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + (perf_counter() - start) * 1000
+
+
+def server_timing_header(timings: dict[str, float]) -> str:
+    return ", ".join(f"{stage};dur={ms:.1f}" for stage, ms in timings.items())
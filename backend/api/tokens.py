@@ -0,0 +1,6 @@
+# Rough OpenAI tokenizer ratio for English text, good enough for budgeting.
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return -(-len(text) // CHARS_PER_TOKEN)
@@ -0,0 +1,141 @@
+"""
+Micro-benchmark for turning search results into a /predict response.
+
+    python -m backend.benchmarks.materialize [--courses 10] [--requirements 40] [--repeat 200]
+
+Compares the old path (validate each Arrow row, dump it to JSON and parse it
+again as UHCourse; dump the finished plan to dicts and validate the whole tree
+as CompleteDegreePathway) with courses_from_arrow and CompleteDegreePathway.assemble.
+Needs no database or API key, the rows are synthetic.
+"""
+import argparse
+import random
+import time
+import uuid
+
+import pyarrow as pa
+
+from backend.api.course_index import courses_from_arrow
+from backend.api.models import (
+    CompleteDegreePathway,
+    DegreePathway,
+    DegreePathwayCandidate,
+    UHCourse,
+    UHCoursePlan,
+)
+
+
+def _rows(count: int) -> pa.Table:
+    rng = random.Random(0)
+    rows = []
+    for _ in range(count):
+        units = float(rng.choice([1, 3, 4]))
+        rows.append(
+            {
+                "course_id": str(uuid.UUID(int=rng.getrandbits(128))),
+                "subject_code": rng.choice(["ICS", "MATH", "ENG", "HIST"]),
+                "course_number": rng.randint(100, 499),
+                "course_suffix": rng.choice([None, "L"]),
+                "course_title": "Introduction to something " * 2,
+                "course_desc": "A course description of typical length. " * 8,
+                "num_units": {"min": units, "max": units},
+                "dept_name": "Department",
+                "inst_ipeds": 141574,
+                "metadata": "",
+                "designations": rng.sample(["DA", "DH", "DL", "FQ", "WI"], 2),
+            }
+        )
+    return pa.Table.from_pylist(rows)
+
+
+def _pathway(requirements: int) -> DegreePathway:
+    per_semester = 5
+    semesters = [
+        {"semester_name": ["fall", "spring"][i % 2], "credits": 15,
+         "courses": [{"name": f"Requirement {i * per_semester + j}", "credits": 3} for j in range(per_semester)]}
+        for i in range(-(-requirements // per_semester))
+    ]
+    return DegreePathway.model_validate(
+        {
+            "program_name": "BS Benchmarking",
+            "institution": "University of Hawaiʻi at Mānoa",
+            "total_credits": 120,
+            "years": [{"year_number": y + 1, "semesters": semesters[y * 2:y * 2 + 2]} for y in range(-(-len(semesters) // 2))],
+        }
+    )
+
+
+def old_courses(data: pa.Table) -> list[UHCourse]:
+    return [UHCourse.model_validate_json(UHCourse(**row).model_dump_json()) for row in data.to_pylist()]
+
+
+def old_plan(pathway: DegreePathway, results: list[list[UHCourse]], candidates: list[dict]) -> CompleteDegreePathway:
+    base = pathway.model_dump()
+    slots = iter(results)
+    base["years"] = [
+        {
+            "year_number": year.year_number,
+            "semesters": [
+                {
+                    "semester_name": semester.semester_name,
+                    "credits": semester.credits,
+                    "courses": [
+                        UHCoursePlan(**(courses := next(slots))[0].model_dump(), candidates=courses).model_dump()
+                        for _ in semester.courses
+                    ],
+                }
+                for semester in year.semesters
+            ],
+        }
+        for year in pathway.years
+    ]
+    base["candidates"] = candidates
+    base["summary"] = ""
+    return CompleteDegreePathway.model_validate(base)
+
+
+def new_plan(pathway: DegreePathway, results: list[list[UHCourse]], candidates: list[dict]) -> CompleteDegreePathway:
+    return CompleteDegreePathway.assemble(
+        pathway,
+        [UHCoursePlan.from_candidates(courses) for courses in results],
+        [DegreePathwayCandidate.model_construct(**c) for c in candidates],
+    )
+
+
+def _time(fn, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m backend.benchmarks.materialize")
+    parser.add_argument("--courses", type=int, default=10, help="results per requirement")
+    parser.add_argument("--requirements", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    data = _rows(args.courses)
+    pathway = _pathway(args.requirements)
+    requirements = sum(len(s.courses) for y in pathway.years for s in y.semesters)
+    candidates = [{"name": pathway.program_name, "pathway_id": pathway.pathway_id}] * 8
+
+    assert old_courses(data) == courses_from_arrow(data)
+    results = [courses_from_arrow(data) for _ in range(requirements)]
+    assert old_plan(pathway, results, candidates).model_dump_json() == new_plan(pathway, results, candidates).model_dump_json()
+
+    # One search result batch per requirement, then one plan, per /predict.
+    old_rows = _time(lambda: old_courses(data), args.repeat) * requirements
+    new_rows = _time(lambda: courses_from_arrow(data), args.repeat) * requirements
+    old_tree = _time(lambda: old_plan(pathway, results, candidates), args.repeat)
+    new_tree = _time(lambda: new_plan(pathway, results, candidates), args.repeat)
+
+    print(f"{requirements} requirements x {args.courses} results per /predict")
+    print(f"{'':<14}{'old ms':>10}{'new ms':>10}{'speedup':>10}")
+    for name, old, new in [("rows", old_rows, new_rows), ("plan", old_tree, new_tree), ("total", old_rows + old_tree, new_rows + new_tree)]:
+        print(f"{name:<14}{old * 1000:>10.2f}{new * 1000:>10.2f}{old / new:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Benchmark for /export PDF rendering.
+
+    python -m backend.benchmarks.pdf_export [--plans 24] [--candidates 5] [--workers 4]
+
+Renders the same batch of distinct synthetic plans inline (what /export used
+to do on the event loop), in a thread, and in a PdfRenderer process pool, and
+reports pages per second. While each runs, a ticker coroutine measures how late
+the event loop wakes it up, which is the delay every other request would see.
+A second pass over the same plans shows the cache. Needs no database or API key.
+"""
+import argparse
+import asyncio
+import io
+import random
+import time
+
+from pypdf import PdfReader
+
+from backend.api.models import CompleteDegreePathway
+from backend.api.pdf import build_pathway_pdf
+from backend.api.pdf_renderer import PdfRenderer
+
+
+def _course(rng: random.Random) -> dict:
+    units = rng.choice([1, 3, 4])
+    return {
+        "subject_code": rng.choice(["ICS", "MATH", "ENG", "HIST"]),
+        "course_number": rng.randint(100, 499),
+        "course_suffix": rng.choice([None, "L"]),
+        "course_title": "Introduction to something",
+        "course_desc": "A course description of typical length, long enough to wrap. " * 6,
+        "num_units": {"min": units, "max": units},
+        "dept_name": "Department",
+        "inst_ipeds": 141574,
+        "metadata": "",
+        "designations": rng.sample(["DA", "DH", "DL", "FQ", "WI"], 2),
+    }
+
+
+def _plan(seed: int, candidates: int) -> CompleteDegreePathway:
+    rng = random.Random(seed)
+
+    def plan_course() -> dict:
+        return {**_course(rng), "candidates": [_course(rng) for _ in range(candidates)]}
+
+    return CompleteDegreePathway.model_validate(
+        {
+            "program_name": f"BS Benchmarking {seed}",
+            "institution": "University of Hawaiʻi at Mānoa",
+            "total_credits": 120,
+            "summary": "A summary paragraph for the plan. " * 10,
+            "candidates": [{"name": f"Pathway {i}", "pathway_id": str(i)} for i in range(5)],
+            "years": [
+                {
+                    "year_number": year + 1,
+                    "semesters": [
+                        {"semester_name": name, "credits": 15, "courses": [plan_course() for _ in range(5)]}
+                        for name in ("fall", "spring")
+                    ],
+                }
+                for year in range(4)
+            ],
+        }
+    )
+
+
+async def _measure(render, plans: list[CompleteDegreePathway]) -> tuple[float, float, list[bytes]]:
+    """Wall time, worst event loop lag while rendering, and the PDFs."""
+    lag = 0.0
+    done = False
+
+    async def ticker():
+        nonlocal lag
+        while not done:
+            expected = time.perf_counter() + 0.005
+            await asyncio.sleep(0.005)
+            lag = max(lag, time.perf_counter() - expected)
+
+    task = asyncio.create_task(ticker())
+    await asyncio.sleep(0)
+    started = time.perf_counter()
+    pdfs = await asyncio.gather(*(render(plan) for plan in plans))
+    elapsed = time.perf_counter() - started
+    done = True
+    await task
+    return elapsed, lag, pdfs
+
+
+async def _inline(plan: CompleteDegreePathway) -> bytes:
+    return build_pathway_pdf(plan)
+
+
+async def run(args: argparse.Namespace) -> None:
+    plans = [_plan(seed, args.candidates) for seed in range(args.plans)]
+    pages = sum(len(PdfReader(io.BytesIO(build_pathway_pdf(plan))).pages) for plan in plans)
+
+    threaded = PdfRenderer(workers=0, max_pending=args.plans, cache_max_bytes=0)
+    pool = PdfRenderer(workers=args.workers, max_pending=args.plans, cache_max_bytes=256 * 1024 * 1024)
+    # Start the worker processes outside the timed runs.
+    await pool.render(_plan(-1, 0))
+
+    runs = [
+        ("inline", _inline),
+        ("thread", threaded.render),
+        (f"pool x{args.workers}", pool.render),
+        ("pool, cached", pool.render),
+    ]
+    print(f"{args.plans} plans, {pages} pages")
+    print(f"{'':<14}{'seconds':>10}{'pages/s':>10}{'max lag ms':>12}")
+    try:
+        for name, render in runs:
+            elapsed, lag, pdfs = await _measure(render, plans)
+            assert len(pdfs) == len(plans) and all(pdf.startswith(b"%PDF") for pdf in pdfs)
+            print(f"{name:<14}{elapsed:>10.2f}{pages / elapsed:>10.0f}{lag * 1000:>12.1f}")
+    finally:
+        pool.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m backend.benchmarks.pdf_export")
+    parser.add_argument("--plans", type=int, default=24)
+    parser.add_argument("--candidates", type=int, default=5, help="candidate courses per requirement")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,49 @@
-import re
+import json
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator
 
-from fastapi import Body, Depends, FastAPI, File, Form, HTTPException, Response, UploadFile
+from fastapi import Body, Depends, FastAPI, File, Form, HTTPException, Request, Response, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 
-from backend.api.application import DegreePathwayPredictor, get_degree_pathway_predictor
-from backend.api.db import PathwayVectorDb, get_pathway_db
-from backend.api.models import CompleteDegreePathway, DegreePathway
-from backend.api.pdf import build_pathway_pdf
+from backend.api.application import DegreePathwayPredictor
+from backend.api.db import PathwaySearchMode, PathwayVectorDb, PathwayView, TextSearchMode
+from backend.api.export import export_filename, merged_stream, zip_stream
+from backend.api.llm import QueryBuildError
+from backend.api.models import (
+    CompleteDegreePathway,
+    DegreePathway,
+    DegreePathwaySummary,
+    PlanExportRequest,
+    PlanSummary,
+    PlanSummaryRequest,
+)
+from backend.api.pdf_renderer import PdfRenderer, RendererBusy
+from backend.api.response_cache import ResponseCache, response_key
+from backend.api.services import (
+    Services,
+    get_pathways,
+    get_predictor,
+    get_renderer,
+    get_responses,
+    get_services,
+    start_services,
+)
+from backend.api.settings import settings
+from backend.api.timing import server_timing_header, start_timings
 from backend.parse import FileParser, get_file_parser
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    services, warm_up = await start_services()
+    app.state.services = services
+    yield
+    warm_up.cancel()
+    services.pdf_renderer.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -17,78 +51,262 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
 
+@app.middleware("http")
+async def server_timing(request: Request, call_next):
+    """Report the stages timed while handling the request in a Server-Timing header."""
+    timings = start_timings()
+    response = await call_next(request)
+    if timings:
+        response.headers["Server-Timing"] = server_timing_header(timings)
+    return response
+
+
+@app.exception_handler(QueryBuildError)
+async def query_build_failed(request: Request, exc: QueryBuildError) -> JSONResponse:
+    """The LLM behind the query builder failed, report it as a bad gateway rather than a 404 or 500."""
+    return JSONResponse({"detail": str(exc)}, status_code=502)
+
+
+@app.get("/ready")
+async def readiness(services: Services = Depends(get_services)) -> JSONResponse:
+    status = services.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+
+def _plan_json(plan: CompleteDegreePathway) -> tuple[str, bool]:
+    """
+    Serialize the plan directly. Returning the model would make FastAPI dump it
+    and validate it against response_model again, and the predictor already
+    assembled it from validated parts. Plans still missing their summary are not
+    cached, so a repeat picks up the summary that finished in the background.
+    """
+    return plan.model_dump_json(by_alias=True), bool(plan.summary)
+
+
+def _json_response(body: str) -> Response:
+    return Response(body, media_type="application/json")
+
+
 @app.post("/predict", response_model=CompleteDegreePathway)
 async def predict_degree_pathway(
     query: str = Form(...),
     files: list[UploadFile] | None = File(default=None),
-    predictor: DegreePathwayPredictor = Depends(get_degree_pathway_predictor),
+    summary_deadline: float | None = Form(default=None),
+    cross_campus: bool = Form(default=False),
+    predictor: DegreePathwayPredictor = Depends(get_predictor),
     file_parser: FileParser = Depends(get_file_parser),
-) -> CompleteDegreePathway:
+    responses: ResponseCache = Depends(get_responses),
+) -> Response:
+    key = response_key(
+        query,
+        await file_parser.fingerprint(files),
+        cross_campus=cross_campus,
+        summary_deadline=summary_deadline,
+    )
+
+    async def compute() -> tuple[str, bool]:
+        parsed_text = await file_parser(files)
+        combined_query = query
+        if parsed_text:
+            combined_query = f"{query.strip()}\n\n{parsed_text}"
+        plan = await predictor.predict(
+            combined_query.strip(),
+            summary_deadline=summary_deadline,
+            cross_campus=cross_campus,
+        )
+        return _plan_json(plan)
+
+    return _json_response(await responses.get_or_compute(key, compute))
+
+
+async def _ndjson_stream(events: AsyncIterator[dict[str, Any]]) -> StreamingResponse:
+    """
+    Start the event stream before responding so lookup errors still map to a
+    status code, then send one JSON object per line.
+    """
+    try:
+        first = await anext(events)
+    except ValueError as exc:
+        raise HTTPException(status_code=404, detail=str(exc))
+
+    async def lines():
+        yield json.dumps(first) + "\n"
+        try:
+            async for event in events:
+                yield json.dumps(event) + "\n"
+        except Exception as exc:
+            yield json.dumps({"event": "error", "detail": str(exc)}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@app.post("/predict/stream")
+async def predict_degree_pathway_stream(
+    query: str = Form(...),
+    files: list[UploadFile] | None = File(default=None),
+    cross_campus: bool = Form(default=False),
+    predictor: DegreePathwayPredictor = Depends(get_predictor),
+    file_parser: FileParser = Depends(get_file_parser),
+) -> StreamingResponse:
     parsed_text = await file_parser(files)
     combined_query = query
     if parsed_text:
         combined_query = f"{query.strip()}\n\n{parsed_text}"
-    return await predictor.predict(combined_query.strip())
+    return await _ndjson_stream(predictor.stream(combined_query.strip(), cross_campus=cross_campus))
+
+
+@app.post("/predict/{pathway_id}/stream")
+async def predict_degree_pathway_by_id_stream(
+    pathway_id: str,
+    query: str = Body(...),
+    cross_campus: bool = False,
+    predictor: DegreePathwayPredictor = Depends(get_predictor),
+) -> StreamingResponse:
+    return await _ndjson_stream(predictor.stream(query, pathway_id=pathway_id, cross_campus=cross_campus))
 
 
 @app.post("/predict/{pathway_id}", response_model=CompleteDegreePathway)
 async def predict_degree_pathway_by_id(
     pathway_id: str,
     query: str = Body(...),
-    predictor: DegreePathwayPredictor = Depends(get_degree_pathway_predictor),
-) -> CompleteDegreePathway:
+    summary_deadline: float | None = None,
+    cross_campus: bool = False,
+    predictor: DegreePathwayPredictor = Depends(get_predictor),
+    responses: ResponseCache = Depends(get_responses),
+) -> Response:
+    key = response_key(query, pathway_id=pathway_id, cross_campus=cross_campus, summary_deadline=summary_deadline)
+
+    async def compute() -> tuple[str, bool]:
+        plan = await predictor.predict_by_pathway_id(
+            pathway_id=pathway_id,
+            query=query,
+            summary_deadline=summary_deadline,
+            cross_campus=cross_campus,
+        )
+        return _plan_json(plan)
+
     try:
-        return await predictor.predict_by_pathway_id(pathway_id=pathway_id, query=query)
+        return _json_response(await responses.get_or_compute(key, compute))
     except ValueError as exc:
         raise HTTPException(status_code=404, detail=str(exc))
 
 
-@app.get("/pathways/text-search", response_model=list[DegreePathway])
+@app.post("/summary", response_model=PlanSummary)
+async def summarize_plan(
+    request: PlanSummaryRequest,
+    predictor: DegreePathwayPredictor = Depends(get_predictor),
+) -> PlanSummary:
+    try:
+        summary = await predictor.summarize(request.plan, request.query)
+    except Exception as exc:
+        raise HTTPException(status_code=502, detail=f"Summary generation failed: {exc}")
+    return PlanSummary(summary=summary)
+
+
+@app.get("/pathways/text-search", response_model=list[DegreePathway] | list[DegreePathwaySummary])
 async def pathway_text_search(
     query: str,
     limit: int = 8,
-    pathway_db: PathwayVectorDb = Depends(get_pathway_db),
-) -> list[DegreePathway]:
+    mode: TextSearchMode = "bm25",
+    view: PathwayView = "full",
+    pathway_db: PathwayVectorDb = Depends(get_pathways),
+) -> list[DegreePathway] | list[DegreePathwaySummary]:
     if not query.strip():
         raise HTTPException(status_code=400, detail="Query must not be empty")
-    return pathway_db.text_search(query=query, limit=limit)
+    return await pathway_db.text_search(query=query, limit=limit, mode=mode, view=view)
 
 
-@app.get("/pathways/similar", response_model=list[DegreePathway])
+@app.get("/pathways/similar", response_model=list[DegreePathway] | list[DegreePathwaySummary])
 async def pathway_similarity_search(
     query: str,
     limit: int = 8,
-    pathway_db: PathwayVectorDb = Depends(get_pathway_db),
-) -> list[DegreePathway]:
+    mode: PathwaySearchMode | None = None,
+    view: PathwayView = "full",
+    pathway_db: PathwayVectorDb = Depends(get_pathways),
+) -> list[DegreePathway] | list[DegreePathwaySummary]:
     if not query.strip():
         raise HTTPException(status_code=400, detail="Query must not be empty")
-    return pathway_db.get_similar_pathways(query=query, limit=limit)
+    return await pathway_db.get_similar_pathways(
+        query=query,
+        limit=limit,
+        mode=mode or settings.pathway_search_mode,
+        view=view,
+    )
 
 
 @app.get("/pathways/{pathway_id}", response_model=DegreePathway)
 async def get_pathway_by_id(
     pathway_id: str,
-    pathway_db: PathwayVectorDb = Depends(get_pathway_db),
+    pathway_db: PathwayVectorDb = Depends(get_pathways),
 ) -> DegreePathway:
-    pathway = pathway_db.get_pathway(pathway_id)
+    pathway = await pathway_db.get_pathway(pathway_id)
     if pathway is None:
         raise HTTPException(status_code=404, detail="Pathway not found")
     return pathway
 
 
-def _export_filename(program_name: str) -> str:
-    slug = re.sub(r"[^a-zA-Z0-9]+", "-", program_name or "").strip("-").lower()
-    if not slug:
-        slug = "degree-pathway"
-    return f"{slug}.pdf"
-
-
 @app.post("/export", response_class=Response)
-async def export_pathway_pdf(plan: CompleteDegreePathway = Body(...)) -> Response:
-    pdf = build_pathway_pdf(plan)
-    filename = _export_filename(plan.program_name)
+async def export_pathway_pdf(
+    plan: CompleteDegreePathway = Body(...),
+    renderer: PdfRenderer = Depends(get_renderer),
+) -> Response:
+    try:
+        pdf = await renderer.render(plan)
+    except RendererBusy as exc:
+        raise HTTPException(status_code=503, detail=str(exc), headers={"Retry-After": "1"})
+    filename = export_filename(plan.program_name)
     headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
     return Response(content=pdf, media_type="application/pdf", headers=headers)
+
+
+@app.post("/export/batch", response_class=StreamingResponse)
+async def export_pathway_batch(
+    request: PlanExportRequest = Body(...),
+    predictor: DegreePathwayPredictor = Depends(get_predictor),
+    renderer: PdfRenderer = Depends(get_renderer),
+) -> StreamingResponse:
+    """
+    Several plans in one download: a ZIP of PDFs, streamed as plans are built
+    and rendered, or one PDF with a table of contents, sent once all are merged.
+    """
+    count = len(request.plans) + len(request.pathway_ids)
+    if count > settings.pdf_export_batch_max_plans:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.pdf_export_batch_max_plans} plans per export, got {count}",
+        )
+
+    completed = None
+    if request.pathway_ids:
+        try:
+            completed = await predictor.complete_pathways(
+                request.pathway_ids,
+                request.query,
+                cross_campus=request.cross_campus,
+            )
+        except ValueError as exc:
+            raise HTTPException(status_code=404, detail=str(exc))
+
+    async def plans() -> AsyncIterator[CompleteDegreePathway]:
+        for plan in request.plans:
+            yield plan
+        if completed is not None:
+            async for plan in completed:
+                yield plan
+
+    try:
+        pdfs = renderer.render_many(plans())
+    except RendererBusy as exc:
+        raise HTTPException(status_code=503, detail=str(exc), headers={"Retry-After": "1"})
+
+    if request.format == "zip":
+        body, media_type = zip_stream(pdfs), "application/zip"
+    else:
+        body, media_type = merged_stream(pdfs), "application/pdf"
+    filename = export_filename("degree-pathways", request.format)
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    return StreamingResponse(body, media_type=media_type, headers=headers)
@@ -0,0 +1,136 @@
+import argparse
+import asyncio
+import json
+import uuid
+from pathlib import Path
+
+from backend.api.candidates import precompute_candidates
+from backend.api.db import get_candidate_store, get_course_db, get_pathway_db
+from backend.api.ingest import get_embedding_pipeline
+from backend.api.llm import get_query_builder
+from backend.api.maintenance import optimize_all
+from backend.api.models import DegreePathway, UHCourse
+from backend.api.settings import settings
+
+
+async def _precompute_candidates(args: argparse.Namespace) -> None:
+    rows = await precompute_candidates(
+        get_course_db(),
+        get_pathway_db(),
+        get_query_builder(),
+        max_candidates=args.max_candidates,
+    )
+    await get_candidate_store().replace(rows)
+
+
+async def _migrate_pathways(args: argparse.Namespace) -> None:
+    pathway_db = get_pathway_db()
+    migrated = pathway_db.migrate()
+    if migrated:
+        print(f"Migrated {migrated} pathways")
+    else:
+        pathway_db.create_id_index()
+        print("pathways table is already up to date, refreshed the pathway_id index")
+
+
+async def _optimize(args: argparse.Namespace) -> None:
+    for report in optimize_all(get_course_db().db, rebuild=args.rebuild, compact=not args.no_compact):
+        print(report)
+
+
+def _stable_id(*parts) -> str:
+    """Records without an id get one derived from their natural key, so re-runs match them up."""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, "/".join(str(p) for p in parts)))
+
+
+def _load_courses(path: Path) -> list[UHCourse]:
+    courses = []
+    for record in json.loads(path.read_text()):
+        if not record.get("course_id"):
+            record["course_id"] = _stable_id(
+                "course",
+                record["inst_ipeds"],
+                record.get("course_prefix", record.get("subject_code")),
+                record["course_number"],
+                record.get("course_suffix") or "",
+            )
+        courses.append(UHCourse.model_validate(record))
+    return courses
+
+
+def _load_pathways(path: Path) -> list[DegreePathway]:
+    pathways = []
+    for record in json.loads(path.read_text()):
+        if not record.get("pathway_id"):
+            record["pathway_id"] = _stable_id("pathway", record["institution"], record["program_name"])
+        pathways.append(DegreePathway.model_validate(record))
+    return pathways
+
+
+async def _ingest_courses(args: argparse.Namespace) -> None:
+    course_db = get_course_db()
+    pipeline = get_embedding_pipeline(course_db.func, args.batch_size, args.concurrency)
+    report = await course_db.sync_courses(_load_courses(args.path), pipeline)
+    print(report)
+    if report.embedded or report.deleted:
+        print("Courses changed, re-run precompute-candidates to refresh the candidate sets")
+
+
+async def _ingest_pathways(args: argparse.Namespace) -> None:
+    pathway_db = get_pathway_db()
+    pipeline = get_embedding_pipeline(pathway_db.func, args.batch_size, args.concurrency)
+    report = await pathway_db.sync_pathways(_load_pathways(args.path), pipeline)
+    print(report)
+    if report.embedded or report.deleted:
+        print("Pathways changed, re-run precompute-candidates to refresh the candidate sets")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m backend.manage")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    precompute = commands.add_parser(
+        "precompute-candidates",
+        help="Resolve every pathway requirement to its candidate course ids",
+    )
+    precompute.add_argument("--max-candidates", type=int, default=settings.candidate_set_max_size)
+    precompute.set_defaults(handler=_precompute_candidates)
+
+    migrate = commands.add_parser(
+        "migrate-pathways",
+        help="Add metadata columns to a pathways table created before they existed",
+    )
+    migrate.set_defaults(handler=_migrate_pathways)
+
+    ingest_courses = commands.add_parser(
+        "ingest-courses",
+        help="Sync the courses table with a JSON catalog, embedding only new or changed courses",
+    )
+    ingest_courses.add_argument("path", type=Path)
+    ingest_courses.add_argument("--batch-size", type=int, default=settings.embedding_batch_size)
+    ingest_courses.add_argument("--concurrency", type=int, default=settings.embedding_concurrency)
+    ingest_courses.set_defaults(handler=_ingest_courses)
+
+    ingest_pathways = commands.add_parser(
+        "ingest-pathways",
+        help="Sync the pathways table with a JSON file, embedding only new or changed pathways",
+    )
+    ingest_pathways.add_argument("path", type=Path)
+    ingest_pathways.add_argument("--batch-size", type=int, default=settings.embedding_batch_size)
+    ingest_pathways.add_argument("--concurrency", type=int, default=settings.embedding_concurrency)
+    ingest_pathways.set_defaults(handler=_ingest_pathways)
+
+    optimize = commands.add_parser(
+        "optimize",
+        help="Build vector and scalar indexes, compact fragments and clean up old table versions",
+    )
+    optimize.add_argument("--rebuild", action="store_true", help="Rebuild indexes that already exist")
+    optimize.add_argument("--no-compact", action="store_true", help="Only build missing indexes")
+    optimize.set_defaults(handler=_optimize)
+
+    args = parser.parse_args()
+    asyncio.run(args.handler(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import hashlib
 import io
 from typing import Iterable
 
@@ -26,6 +27,21 @@ class FileParser:
 
         return "\n\n".join(fragment for fragment in fragments if fragment).strip()
 
+    async def fingerprint(self, files: Iterable[UploadFile] | None = None) -> str:
+        """Hash of the uploaded names and bytes, cheap enough to compute before parsing."""
+        if not files:
+            return ""
+
+        digest = hashlib.sha256()
+        for upload in files:
+            if upload is None:
+                continue
+            data = await upload.read()
+            await upload.seek(0)
+            digest.update((upload.filename or "").encode("utf-8") + b"\0")
+            digest.update(hashlib.sha256(data).digest())
+        return digest.hexdigest()
+
     async def _parse_file(self, upload: UploadFile) -> str:
         filename = (upload.filename or "").lower()
         data = await upload.read()
@@ -0,0 +1,128 @@
+"""
+A /predict that misses its summary deadline returns the plan without a summary,
+and the same request repeated afterwards gets the summary that finished in the
+background instead of starting another LLM call.
+
+    python -m unittest discover -s backend/tests -t .
+"""
+import asyncio
+import unittest
+from types import SimpleNamespace
+
+from backend.api.application import DegreePathwayPredictor
+from backend.api.db import CourseVectorDb
+from backend.api.models import CourseQueryBase, DegreePathway
+from backend.api.response_cache import MemoryResponseStore, ResponseCache, response_key
+from backend.api.summary import SummaryService
+from backend.main import predict_degree_pathway_by_id
+
+PATHWAY = DegreePathway.model_validate(
+    {
+        "pathway_id": "bs-testing",
+        "program_name": "BS Testing",
+        "institution": "University of Hawaiʻi at Mānoa",
+        "total_credits": 6,
+        "years": [
+            {
+                "year_number": 1,
+                "semesters": [
+                    {"semester_name": "fall", "credits": 3, "courses": [{"name": "Elective", "credits": 3}]},
+                    {"semester_name": "spring", "credits": 3, "courses": [{"name": "Capstone", "credits": 3}]},
+                ],
+            }
+        ],
+    }
+)
+
+
+class FakeEmbedder:
+    async def embed(self, query: str) -> list[float]:
+        return [0.0, 1.0]
+
+
+class FakePathwayDb:
+    async def get_similar_pathways(self, query, vector, mode=None) -> list[DegreePathway]:
+        return [PATHWAY]
+
+    async def get_pathway(self, pathway_id: str):
+        return PATHWAY if pathway_id == PATHWAY.pathway_id else None
+
+
+class FakeQueryBuilder:
+    async def build_queries(self, names: list[str]):
+        return [CourseQueryBase() for _ in names]
+
+
+class FakeCourseDb:
+    """Finds nothing, so every requirement becomes a placeholder course."""
+
+    build_query = staticmethod(CourseVectorDb.build_query)
+
+    def search_similar_courses(self, queries) -> list[asyncio.Future]:
+        futures = []
+        for _ in queries:
+            future = asyncio.get_running_loop().create_future()
+            future.set_result([])
+            futures.append(future)
+        return futures
+
+
+class SlowAgent:
+    """Holds every summary until release is set."""
+
+    def __init__(self):
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def run(self, prompt: str):
+        self.calls += 1
+        await self.release.wait()
+        return SimpleNamespace(output="A summary.")
+
+
+class SummaryDeadlineTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.agent = SlowAgent()
+        self.summaries = SummaryService(self.agent)
+        self.predictor = DegreePathwayPredictor(
+            course_db=FakeCourseDb(),
+            pathway_db=FakePathwayDb(),
+            query_builder=FakeQueryBuilder(),
+            embedder=FakeEmbedder(),
+            summary_service=self.summaries,
+        )
+        self.responses = ResponseCache(MemoryResponseStore(max_entries=16, ttl=60))
+
+    async def predict(self, deadline: float) -> str:
+        response = await predict_degree_pathway_by_id(
+            pathway_id=PATHWAY.pathway_id,
+            query="I like testing",
+            summary_deadline=deadline,
+            cross_campus=False,
+            predictor=self.predictor,
+            responses=self.responses,
+        )
+        return response.body.decode("utf-8")
+
+    async def test_repeat_after_missed_deadline_gets_summary(self):
+        first = await self.predict(deadline=0.01)
+        self.assertIn('"summary":""', first)
+        self.assertIn('"course_prefix":"TBD"', first)
+
+        # The generation keeps running after the deadline, let it finish.
+        self.agent.release.set()
+        await asyncio.gather(*self.summaries._inflight.values())
+
+        second = await self.predict(deadline=0.01)
+        self.assertIn('"summary":"A summary."', second)
+        self.assertEqual(self.agent.calls, 1)
+        self.assertEqual(self.summaries.prompts_built, 1)
+
+    async def test_deadline_is_part_of_response_key(self):
+        query = "I like testing"
+        self.assertNotEqual(response_key(query, summary_deadline=1.0), response_key(query))
+        self.assertEqual(response_key(query, summary_deadline=1), response_key(query, summary_deadline=1.0))
+
+
+if __name__ == "__main__":
+    unittest.main()